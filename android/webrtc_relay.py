@@ -5,14 +5,21 @@ WebRTC relay server for Android emulator screen streaming
 
 import asyncio
 import argparse
+import fcntl
 import logging
-import subprocess
+import os
+import signal
 from aiohttp import web
 import json
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Linux-only fcntl constant (exposed by the fcntl module from Python 3.10)
+F_SETPIPE_SZ = getattr(fcntl, "F_SETPIPE_SZ", 1031)
+PIPE_BUFFER_SIZE = 1 << 20
+READ_CHUNK_SIZE = 65536
+
 
 class WebRTCRelay:
     """WebRTC relay server for streaming Android screen"""
@@ -22,6 +29,11 @@ class WebRTCRelay:
         self.app = web.Application()
         self.setup_routes()
         self.screen_capture_process = None
+        self._reader_task = None
+        self._pipe_transport = None
+        self._shutdown = asyncio.Event()
+        # Bytes read from screenrecord, reported by /health as capture progress
+        self.bytes_captured = 0
 
     def setup_routes(self):
         """Setup HTTP routes"""
@@ -31,7 +43,13 @@ class WebRTCRelay:
 
     async def health_check(self, request):
         """Health check endpoint"""
-        return web.json_response({"status": "ok"})
+        return web.json_response(
+            {
+                "status": "ok",
+                "capturing": self.screen_capture_process is not None,
+                "bytes_captured": self.bytes_captured,
+            }
+        )
 
     async def start_capture(self, request):
         """Start screen capture from emulator"""
@@ -41,20 +59,39 @@ class WebRTCRelay:
                     {"success": False, "message": "Capture already running"}
                 )
 
-            # Use screenrecord to capture screen
-            # In production, this would be piped to WebRTC
-            cmd = [
-                "adb",
-                "shell",
-                "screenrecord",
-                "--output-format=h264",
-                "--bit-rate=4000000",
-                "/sdcard/stream.mp4",
-            ]
-
-            self.screen_capture_process = subprocess.Popen(
-                cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            # Stream raw H.264 from screenrecord over a pipe instead of
+            # writing it to the emulator's sdcard
+            read_fd, write_fd = os.pipe()
+            try:
+                fcntl.fcntl(read_fd, F_SETPIPE_SZ, PIPE_BUFFER_SIZE)
+            except OSError as e:
+                logger.warning(f"Could not resize capture pipe buffer: {e}")
+
+            try:
+                self.screen_capture_process = await asyncio.create_subprocess_exec(
+                    "adb",
+                    "exec-out",
+                    "screenrecord",
+                    "--output-format=h264",
+                    "--bit-rate=4000000",
+                    "-",
+                    stdout=write_fd,
+                    stderr=asyncio.subprocess.DEVNULL,
+                )
+            except Exception:
+                os.close(read_fd)
+                raise
+            finally:
+                os.close(write_fd)
+
+            reader = asyncio.StreamReader()
+            loop = asyncio.get_running_loop()
+            self._pipe_transport, _ = await loop.connect_read_pipe(
+                lambda: asyncio.StreamReaderProtocol(reader),
+                os.fdopen(read_fd, "rb", buffering=0),
             )
+            self.bytes_captured = 0
+            self._reader_task = asyncio.create_task(self._read_stream(reader))
 
             logger.info("Screen capture started")
 
@@ -64,11 +101,46 @@ class WebRTCRelay:
             logger.error(f"Error starting capture: {e}")
             return web.json_response({"success": False, "error": str(e)})
 
+    async def _read_stream(self, reader):
+        """Drain screenrecord's pipe so the capture never stalls on a full buffer
+
+        The relay has no WebRTC sender yet, so the H.264 is not forwarded
+        anywhere; the backend streams devices itself over adb.
+        """
+        try:
+            while chunk := await reader.read(READ_CHUNK_SIZE):
+                self.bytes_captured += len(chunk)
+        except Exception as e:
+            logger.error(f"Error reading capture stream: {e}")
+
+        logger.info("Screen capture stream ended")
+
+        # Clear the dead capture so /start-capture can run it again
+        self._reader_task = None
+        if self._pipe_transport:
+            self._pipe_transport.close()
+            self._pipe_transport = None
+        if process := self.screen_capture_process:
+            self.screen_capture_process = None
+            if process.returncode is None:
+                process.terminate()
+            await process.wait()
+
     async def stop_capture(self, request):
         """Stop screen capture"""
         try:
+            if self._reader_task:
+                self._reader_task.cancel()
+                self._reader_task = None
+
+            if self._pipe_transport:
+                self._pipe_transport.close()
+                self._pipe_transport = None
+
             if self.screen_capture_process:
-                self.screen_capture_process.terminate()
+                if self.screen_capture_process.returncode is None:
+                    self.screen_capture_process.terminate()
+                    await self.screen_capture_process.wait()
                 self.screen_capture_process = None
                 logger.info("Screen capture stopped")
 
@@ -87,9 +159,16 @@ class WebRTCRelay:
 
         logger.info(f"WebRTC relay server started on port {self.port}")
 
-        # Keep running
-        while True:
-            await asyncio.sleep(3600)
+        # Park until SIGTERM/SIGINT, then shut down cleanly
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self._shutdown.set)
+
+        await self._shutdown.wait()
+
+        logger.info("Shutting down WebRTC relay server")
+        await self.stop_capture(None)
+        await runner.cleanup()
 
 
 async def main():
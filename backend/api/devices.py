@@ -1,15 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi.responses import Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from pydantic import BaseModel
+from sqlalchemy import insert, select, func
+from pydantic import BaseModel, TypeAdapter
 from typing import List, Optional
 from datetime import datetime
 
+from services.cache import redis_cached, invalidate
 from services.database import get_session, Device, User
-from services.vm_manager import VMManager
+from services.metrics_poller import get_cached_metrics
+from services.vm_manager import vm_manager
 
 router = APIRouter()
-vm_manager = VMManager()
 
 
 # Pydantic schemas
@@ -45,6 +47,10 @@ class DeviceControl(BaseModel):
     action: str  # start, stop, restart
 
 
+# Serializes device lists straight to JSON bytes
+device_list_adapter = TypeAdapter(List[DeviceResponse])
+
+
 @router.post("/", response_model=DeviceResponse, status_code=status.HTTP_201_CREATED)
 async def create_device(
     user_id: int,
@@ -53,41 +59,46 @@ async def create_device(
     db: AsyncSession = Depends(get_session),
 ):
     """Create a new virtual Android device"""
-    # Check user exists
-    stmt = select(User).where(User.id == user_id)
+    # Check user exists and count their devices in one round trip
+    stmt = (
+        select(User.max_devices, func.count(Device.id))
+        .join(Device, Device.user_id == User.id, isouter=True)
+        .where(User.id == user_id)
+        .group_by(User.id)
+    )
     result = await db.execute(stmt)
-    user = result.scalar_one_or_none()
+    row = result.one_or_none()
 
-    if not user:
+    if row is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
 
-    # Check device limit
-    stmt = select(Device).where(Device.user_id == user_id)
-    result = await db.execute(stmt)
-    user_devices = result.scalars().all()
-
-    if len(user_devices) >= user.max_devices:
+    max_devices, device_count = row
+    if device_count >= max_devices:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Maximum device limit ({user.max_devices}) reached",
+            detail=f"Maximum device limit ({max_devices}) reached",
         )
 
     # Create device record
-    new_device = Device(
-        user_id=user_id,
-        device_name=device_data.device_name,
-        android_version=device_data.android_version,
-        device_model=device_data.device_model,
-        cpu_allocated=device_data.cpu_allocated,
-        ram_allocated=device_data.ram_allocated,
-        status="stopped",
+    stmt = (
+        insert(Device)
+        .values(
+            user_id=user_id,
+            device_name=device_data.device_name,
+            android_version=device_data.android_version,
+            device_model=device_data.device_model,
+            cpu_allocated=device_data.cpu_allocated,
+            ram_allocated=device_data.ram_allocated,
+            status="stopped",
+        )
+        .returning(Device)
     )
 
-    db.add(new_device)
+    result = await db.execute(stmt)
+    new_device = result.scalar_one()
     await db.commit()
-    await db.refresh(new_device)
 
     return new_device
 
@@ -106,16 +117,19 @@ async def list_devices(
         stmt = select(Device).offset(skip).limit(limit)
 
     result = await db.execute(stmt)
-    devices = result.scalars().all()
-    return devices
+    devices = device_list_adapter.validate_python(
+        result.scalars().all(), from_attributes=True
+    )
+    return Response(
+        content=device_list_adapter.dump_json(devices), media_type="application/json"
+    )
 
 
 @router.get("/{device_id}", response_model=DeviceResponse)
+@redis_cached("device", key="device_id", model=DeviceResponse)
 async def get_device(device_id: int, db: AsyncSession = Depends(get_session)):
     """Get device by ID"""
-    stmt = select(Device).where(Device.id == device_id)
-    result = await db.execute(stmt)
-    device = result.scalar_one_or_none()
+    device = await db.get(Device, device_id)
 
     if not device:
         raise HTTPException(
@@ -133,9 +147,7 @@ async def control_device(
     db: AsyncSession = Depends(get_session),
 ):
     """Start, stop, or restart a device"""
-    stmt = select(Device).where(Device.id == device_id)
-    result = await db.execute(stmt)
-    device = result.scalar_one_or_none()
+    device = await db.get(Device, device_id)
 
     if not device:
         raise HTTPException(
@@ -150,7 +162,7 @@ async def control_device(
         device.ip_address = container_info.get("ip_address")
         device.webrtc_port = container_info.get("webrtc_port")
         device.adb_port = container_info.get("adb_port")
-        device.last_used = datetime.utcnow()
+        device.last_used = func.now()
 
     elif control.action == "stop":
         await vm_manager.stop_device(device)
@@ -159,7 +171,7 @@ async def control_device(
     elif control.action == "restart":
         await vm_manager.restart_device(device)
         device.status = "running"
-        device.last_used = datetime.utcnow()
+        device.last_used = func.now()
 
     else:
         raise HTTPException(
@@ -169,6 +181,7 @@ async def control_device(
 
     await db.commit()
     await db.refresh(device)
+    await invalidate("device", device_id)
 
     return device
 
@@ -176,9 +189,7 @@ async def control_device(
 @router.delete("/{device_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_device(device_id: int, db: AsyncSession = Depends(get_session)):
     """Delete a device"""
-    stmt = select(Device).where(Device.id == device_id)
-    result = await db.execute(stmt)
-    device = result.scalar_one_or_none()
+    device = await db.get(Device, device_id)
 
     if not device:
         raise HTTPException(
@@ -191,6 +202,7 @@ async def delete_device(device_id: int, db: AsyncSession = Depends(get_session))
 
     await db.delete(device)
     await db.commit()
+    await invalidate("device", device_id)
 
     return None
 
@@ -198,9 +210,7 @@ async def delete_device(device_id: int, db: AsyncSession = Depends(get_session))
 @router.get("/{device_id}/metrics")
 async def get_device_metrics(device_id: int, db: AsyncSession = Depends(get_session)):
     """Get real-time device metrics"""
-    stmt = select(Device).where(Device.id == device_id)
-    result = await db.execute(stmt)
-    device = result.scalar_one_or_none()
+    device = await db.get(Device, device_id)
 
     if not device:
         raise HTTPException(
@@ -210,5 +220,8 @@ async def get_device_metrics(device_id: int, db: AsyncSession = Depends(get_sess
     if device.status != "running" or not device.container_id:
         return {"cpu_usage": 0, "ram_usage": 0, "network_in": 0, "network_out": 0}
 
-    metrics = await vm_manager.get_container_metrics(device.container_id)
-    return metrics
+    # Served from the background poller; fall back to a live read on a miss
+    if metrics := await get_cached_metrics(device.container_id):
+        return metrics
+
+    return await vm_manager.get_container_metrics(device.container_id)
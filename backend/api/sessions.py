@@ -6,15 +6,17 @@ from fastapi import (
     WebSocket,
     WebSocketDisconnect,
 )
+from fastapi.responses import Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from pydantic import BaseModel
+from sqlalchemy import func, insert, select, update
+from pydantic import BaseModel, TypeAdapter
 from typing import List, Optional
 from datetime import datetime
+import base64
 import secrets
-import json
+import orjson
 
-from datetime import timezone
+from services.cache import redis_cached, invalidate
 from services.database import get_session, Session, Device, User, async_session
 from services.webrtc_server import WebRTCManager
 
@@ -41,15 +43,17 @@ class SessionResponse(BaseModel):
         from_attributes = True
 
 
+# Serializes session lists straight to JSON bytes
+session_list_adapter = TypeAdapter(List[SessionResponse])
+
+
 @router.post("/", response_model=SessionResponse, status_code=status.HTTP_201_CREATED)
 async def create_session(
     session_data: SessionCreate, db: AsyncSession = Depends(get_session)
 ):
     """Create a new streaming session"""
     # Verify user exists
-    stmt = select(User).where(User.id == session_data.user_id)
-    result = await db.execute(stmt)
-    user = result.scalar_one_or_none()
+    user = await db.get(User, session_data.user_id)
 
     if not user or not user.is_active:
         raise HTTPException(
@@ -57,9 +61,7 @@ async def create_session(
         )
 
     # Verify device exists and belongs to user
-    stmt = select(Device).where(Device.id == session_data.device_id)
-    result = await db.execute(stmt)
-    device = result.scalar_one_or_none()
+    device = await db.get(Device, session_data.device_id)
 
     if not device:
         raise HTTPException(
@@ -78,20 +80,26 @@ async def create_session(
             detail="Device is not running. Please start the device first.",
         )
 
-    # Generate session token
-    session_token = secrets.token_urlsafe(32)
+    # Generate session token (192 bits, unpadded base64url)
+    session_token = (
+        base64.urlsafe_b64encode(secrets.token_bytes(24)).rstrip(b"=").decode()
+    )
 
     # Create session
-    new_session = Session(
-        user_id=session_data.user_id,
-        device_id=session_data.device_id,
-        session_token=session_token,
-        status="active",
+    stmt = (
+        insert(Session)
+        .values(
+            user_id=session_data.user_id,
+            device_id=session_data.device_id,
+            session_token=session_token,
+            status="active",
+        )
+        .returning(Session)
     )
 
-    db.add(new_session)
+    result = await db.execute(stmt)
+    new_session = result.scalar_one()
     await db.commit()
-    await db.refresh(new_session)
 
     return new_session
 
@@ -116,15 +124,20 @@ async def list_sessions(
     stmt = stmt.offset(skip).limit(limit)
 
     result = await db.execute(stmt)
-    return result.scalars().all()
+    sessions = session_list_adapter.validate_python(
+        result.scalars().all(), from_attributes=True
+    )
+    return Response(
+        content=session_list_adapter.dump_json(sessions),
+        media_type="application/json",
+    )
 
 
 @router.get("/{session_id}", response_model=SessionResponse)
+@redis_cached("session", key="session_id", model=SessionResponse)
 async def get_session(session_id: int, db: AsyncSession = Depends(get_session)):
     """Get session by ID"""
-    stmt = select(Session).where(Session.id == session_id)
-    result = await db.execute(stmt)
-    if session := result.scalar_one_or_none():
+    if session := await db.get(Session, session_id):
         return session
     else:
         raise HTTPException(
@@ -135,9 +148,7 @@ async def get_session(session_id: int, db: AsyncSession = Depends(get_session)):
 @router.post("/{session_id}/end", response_model=SessionResponse)
 async def end_session(session_id: int, db: AsyncSession = Depends(get_session)):
     """End a streaming session"""
-    stmt = select(Session).where(Session.id == session_id)
-    result = await db.execute(stmt)
-    session = result.scalar_one_or_none()
+    session = await db.get(Session, session_id)
 
     if not session:
         raise HTTPException(
@@ -145,10 +156,11 @@ async def end_session(session_id: int, db: AsyncSession = Depends(get_session)):
         )
 
     session.status = "ended"
-    session.ended_at = datetime.now(timezone.utc)
+    session.ended_at = func.now()
 
     await db.commit()
     await db.refresh(session)
+    await invalidate("session", session_id)
 
     return session
 
@@ -158,31 +170,30 @@ async def websocket_endpoint(websocket: WebSocket, session_token: str):
     """WebSocket endpoint for WebRTC signaling"""
     await websocket.accept()
 
-    # Verify session token and get device info
-    device = None
+    # Verify session token and load its device in one query
     async with async_session() as db:
-        stmt = select(Session).where(Session.session_token == session_token)
+        stmt = (
+            select(Session, Device)
+            .join(Device, Session.device_id == Device.id)
+            .where(Session.session_token == session_token)
+        )
         result = await db.execute(stmt)
-        session = result.scalar_one_or_none()
+        row = result.one_or_none()
 
-        if not session or session.status != "active":
-            await websocket.close(code=1008, reason="Invalid or inactive session")
-            return
+    if not row or row.Session.status != "active":
+        await websocket.close(code=1008, reason="Invalid or inactive session")
+        return
 
-        # Get device info
-        stmt = select(Device).where(Device.id == session.device_id)
-        result = await db.execute(stmt)
-        device = result.scalar_one_or_none()
-
-        if not device or device.status != "running":
-            await websocket.close(code=1008, reason="Device not available")
-            return
+    session, device = row
+    if device.status != "running":
+        await websocket.close(code=1008, reason="Device not available")
+        return
 
     try:
         # Handle WebRTC signaling
         while True:
             data = await websocket.receive_text()
-            message = json.loads(data)
+            message = orjson.loads(data)
 
             # Process WebRTC messages (offer, answer, ice candidates)
             try:
@@ -191,7 +202,7 @@ async def websocket_endpoint(websocket: WebSocket, session_token: str):
                 )
 
                 if response:
-                    await websocket.send_text(json.dumps(response))
+                    await websocket.send_text(orjson.dumps(response).decode())
 
                     # If WebRTC not available, notify client but keep connection open
                     if (
@@ -203,23 +214,24 @@ async def websocket_endpoint(websocket: WebSocket, session_token: str):
             except Exception as msg_error:
                 # Log error but keep WebSocket open
                 await websocket.send_text(
-                    json.dumps(
+                    orjson.dumps(
                         {
                             "type": "error",
                             "message": f"Message processing error: {str(msg_error)}",
                         }
-                    )
+                    ).decode()
                 )
 
     except WebSocketDisconnect:
         # Update session status
         async with async_session() as db:
-            stmt = select(Session).where(Session.session_token == session_token)
-            result = await db.execute(stmt)
-
-            if session := result.scalar_one_or_none():
-                session.status = "disconnected"
-                await db.commit()
+            await db.execute(
+                update(Session)
+                .where(Session.id == session.id)
+                .values(status="disconnected")
+            )
+            await db.commit()
+        await invalidate("session", session.id)
 
     except Exception as e:
         await websocket.close(code=1011, reason=str(e))
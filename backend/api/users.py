@@ -1,15 +1,30 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from pydantic import BaseModel, EmailStr
+from sqlalchemy import insert, select
+from pydantic import BaseModel, EmailStr, TypeAdapter
 from typing import List, Optional
 from datetime import datetime
-from passlib.hash import pbkdf2_sha256
+from passlib.context import CryptContext
+import asyncio
 
+from config import settings
+from services.cache import redis_cached, invalidate
 from services.database import get_session, User
 
 router = APIRouter()
 
+# Existing pbkdf2_sha256 hashes keep verifying; new hashes use PASSWORD_HASHER
+hash_options = {}
+if settings.PASSWORD_HASH_ROUNDS:
+    hash_options[f"{settings.PASSWORD_HASHER}__rounds"] = settings.PASSWORD_HASH_ROUNDS
+
+pwd_context = CryptContext(
+    schemes=list(dict.fromkeys([settings.PASSWORD_HASHER, "pbkdf2_sha256"])),
+    deprecated="auto",
+    **hash_options,
+)
+
 
 # Pydantic schemas
 class UserCreate(BaseModel):
@@ -37,6 +52,10 @@ class UserUpdate(BaseModel):
     max_devices: Optional[int] = None
 
 
+# Serializes user lists straight to JSON bytes
+user_list_adapter = TypeAdapter(List[UserResponse])
+
+
 @router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def create_user(user_data: UserCreate, db: AsyncSession = Depends(get_session)):
     """Create a new user"""
@@ -54,16 +73,21 @@ async def create_user(user_data: UserCreate, db: AsyncSession = Depends(get_sess
         )
 
     # Create new user
-    hashed_password = pbkdf2_sha256.hash(user_data.password)
-    new_user = User(
-        username=user_data.username,
-        email=user_data.email,
-        hashed_password=hashed_password,
+    # Hash off the event loop so signups don't stall other requests
+    hashed_password = await asyncio.to_thread(pwd_context.hash, user_data.password)
+    stmt = (
+        insert(User)
+        .values(
+            username=user_data.username,
+            email=user_data.email,
+            hashed_password=hashed_password,
+        )
+        .returning(User)
     )
 
-    db.add(new_user)
+    result = await db.execute(stmt)
+    new_user = result.scalar_one()
     await db.commit()
-    await db.refresh(new_user)
 
     return new_user
 
@@ -75,16 +99,19 @@ async def list_users(
     """List all users"""
     stmt = select(User).offset(skip).limit(limit)
     result = await db.execute(stmt)
-    users = result.scalars().all()
-    return users
+    users = user_list_adapter.validate_python(
+        result.scalars().all(), from_attributes=True
+    )
+    return Response(
+        content=user_list_adapter.dump_json(users), media_type="application/json"
+    )
 
 
 @router.get("/{user_id}", response_model=UserResponse)
+@redis_cached("user", key="user_id", model=UserResponse)
 async def get_user(user_id: int, db: AsyncSession = Depends(get_session)):
     """Get user by ID"""
-    stmt = select(User).where(User.id == user_id)
-    result = await db.execute(stmt)
-    user = result.scalar_one_or_none()
+    user = await db.get(User, user_id)
 
     if not user:
         raise HTTPException(
@@ -99,9 +126,7 @@ async def update_user(
     user_id: int, user_data: UserUpdate, db: AsyncSession = Depends(get_session)
 ):
     """Update user"""
-    stmt = select(User).where(User.id == user_id)
-    result = await db.execute(stmt)
-    user = result.scalar_one_or_none()
+    user = await db.get(User, user_id)
 
     if not user:
         raise HTTPException(
@@ -118,6 +143,7 @@ async def update_user(
 
     await db.commit()
     await db.refresh(user)
+    await invalidate("user", user_id)
 
     return user
 
@@ -125,9 +151,7 @@ async def update_user(
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_user(user_id: int, db: AsyncSession = Depends(get_session)):
     """Delete user"""
-    stmt = select(User).where(User.id == user_id)
-    result = await db.execute(stmt)
-    user = result.scalar_one_or_none()
+    user = await db.get(User, user_id)
 
     if not user:
         raise HTTPException(
@@ -136,5 +160,6 @@ async def delete_user(user_id: int, db: AsyncSession = Depends(get_session)):
 
     await db.delete(user)
     await db.commit()
+    await invalidate("user", user_id)
 
     return None
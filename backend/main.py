@@ -1,12 +1,20 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import HTMLResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from contextlib import asynccontextmanager
 import logging
 
 from api import devices, users, sessions
+from config import settings
+from services.cache import redis
 from services.database import init_db, close_db
+from services.docker_client import get_docker_client
+from services.db_pool import CircuitOpenError
+from services.metric_writer import metric_writer
+from services.metrics_poller import MetricsPoller
+from services.orchestrator import orchestrator
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -21,11 +29,30 @@ async def lifespan(app: FastAPI):
     await init_db()
     logger.info("Database initialized")
 
+    # The dashboard template is static, so render it once per process
+    app.state.admin_html = templates.get_template("dashboard.html").render()
+
+    await get_docker_client().start()
+    await metric_writer.start()
+    metrics_poller = MetricsPoller(devices.vm_manager)
+    await metrics_poller.start()
+    await devices.vm_manager.warm_pool.start()
+    await sessions.webrtc_manager.pc_pool.start()
+    await orchestrator.start()
+
     yield
 
     # Shutdown
     logger.info("Shutting down VMI Platform...")
+    await orchestrator.stop()
+    await sessions.webrtc_manager.pc_pool.stop()
+    await devices.vm_manager.warm_pool.stop()
+    await metrics_poller.stop()
+    await devices.vm_manager.stop_stats_streams()
+    await metric_writer.stop()
+    await get_docker_client().stop()
     await close_db()
+    await redis.aclose()
 
 
 # Create FastAPI application
@@ -34,17 +61,26 @@ app = FastAPI(
     description="API for managing virtual Android devices with WebRTC streaming",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=tuple(settings.CORS_ORIGINS),
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=("GET", "POST", "PATCH", "DELETE"),
+    allow_headers=("authorization", "content-type"),
+    max_age=86400,  # let browsers cache preflight responses for a day
 )
 
+
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request: Request, exc: CircuitOpenError):
+    """Fail fast with 503 while the database circuit breaker is open"""
+    return ORJSONResponse(status_code=503, content={"detail": str(exc)})
+
+
 # Templates for admin dashboard
 templates = Jinja2Templates(directory="templates")
 
@@ -64,10 +100,10 @@ async def root():
     }
 
 
-@app.get("/admin")
+@app.get("/admin", response_class=HTMLResponse)
 async def admin_dashboard(request: Request):
     """Admin dashboard"""
-    return templates.TemplateResponse("dashboard.html", {"request": request})
+    return HTMLResponse(request.app.state.admin_html)
 
 
 @app.get("/health")
@@ -1,63 +1,297 @@
 """ADB utility functions for managing Android device connections and boot status"""
 
 import asyncio
-import shlex
 import logging
+import os
+import struct
+import time
+from typing import Dict, List, Tuple
+
+from config import settings
 
 logger = logging.getLogger(__name__)
 
+SHELL_SENTINEL = "__ADB_SHELL_END__"
+
+ADB_SERVER_HOST = "127.0.0.1"
+ADB_SERVER_PORT = 5037
+SYNC_CHUNK_SIZE = 64 * 1024  # max DATA payload in the sync protocol
+INPUT_BATCH_WINDOW = 0.008  # seconds input commands wait to share one write
+
+# Caps concurrent adb CLI processes so bursts don't overwhelm the adb server
+_adb_slots = asyncio.Semaphore(settings.ADB_MAX_CONCURRENCY)
+
 
-async def run(cmd: str):
-    """Execute a shell command and return (returncode, output)"""
-    proc = await asyncio.create_subprocess_shell(
-        cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
-    )
-    out, _ = await proc.communicate()
+async def run(*argv: str):
+    """Execute a command (no intermediate shell) and return (returncode, output)"""
+    async with _adb_slots:
+        proc = await asyncio.create_subprocess_exec(
+            *argv, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
+        )
+        out, _ = await proc.communicate()
     return proc.returncode, (out or b"").decode("utf-8", "ignore")
 
 
+class AdbShell:
+    """Long-lived `adb shell` session that runs commands over one stdin/stdout pipe"""
+
+    def __init__(self, serial: str):
+        self.serial = serial
+        self.proc = None
+        self.lock = asyncio.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.returncode is None
+
+    async def _spawn(self):
+        self.proc = await asyncio.create_subprocess_exec(
+            "adb",
+            "-s",
+            self.serial,
+            "shell",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+        logger.info(f"🔌 Persistent adb shell opened for {self.serial}")
+
+    async def execute(self, command: str):
+        """Run a command in the shell and return (returncode, output)"""
+        async with self.lock:
+            if not self.alive:
+                await self._spawn()
+
+            try:
+                self.proc.stdin.write(
+                    f"{command}\necho {SHELL_SENTINEL}$?\n".encode()
+                )
+                await self.proc.stdin.drain()
+
+                lines = []
+                while True:
+                    line = await self.proc.stdout.readline()
+                    if not line:
+                        raise ConnectionError(f"adb shell for {self.serial} closed")
+
+                    text = line.decode("utf-8", "ignore")
+                    if SHELL_SENTINEL in text:
+                        # Output without a trailing newline shares the sentinel's line
+                        head, _, status = text.partition(SHELL_SENTINEL)
+                        lines.append(head)
+                        return int(status), "".join(lines)
+                    lines.append(text)
+
+            except BaseException:
+                # Drop a broken or cancelled session; the next call reopens it
+                await self._kill()
+                raise
+
+    async def _kill(self):
+        if self.alive:
+            self.proc.kill()
+            await self.proc.wait()
+        self.proc = None
+
+    async def close(self):
+        """Close the shell session"""
+        async with self.lock:
+            await self._kill()
+
+
+_shells: Dict[str, AdbShell] = {}
+
+
+def adb_shell(serial: str) -> AdbShell:
+    """Get the shared persistent shell for a device"""
+    if serial not in _shells:
+        _shells[serial] = AdbShell(serial)
+    return _shells[serial]
+
+
+class InputBatcher:
+    """Coalesces a device's input commands into single persistent-shell writes
+
+    Commands submitted within INPUT_BATCH_WINDOW of each other (a drag fires
+    many per frame) go out as one `cmd1; cmd2; ...` line, so the batch costs
+    one pipe write and one shell round trip instead of one per event.
+    """
+
+    def __init__(self, serial: str):
+        self.serial = serial
+        self.pending: List[str] = []
+        self.task = None
+
+    def submit(self, command: str):
+        """Queue a command; it runs in order with the rest of its batch"""
+        self.pending.append(command)
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._flush())
+
+    async def _flush(self):
+        await asyncio.sleep(INPUT_BATCH_WINDOW)
+        # Commands queued while a batch runs form the next batch
+        while self.pending:
+            commands, self.pending = self.pending, []
+            try:
+                rc, out = await adb_shell(self.serial).execute("; ".join(commands))
+                if rc != 0:
+                    logger.warning(
+                        f"Input batch failed on {self.serial}: {out.strip()}"
+                    )
+            except Exception as e:
+                logger.error(f"Error sending input to {self.serial}: {e}")
+
+
+async def adb_close_shells():
+    """Close all persistent shell sessions"""
+    shells = list(_shells.values())
+    _shells.clear()
+    await asyncio.gather(*(shell.close() for shell in shells), return_exceptions=True)
+
+
+async def _adb_request(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter, request: str
+):
+    """Send one length-prefixed request to the adb server and check its status"""
+    data = request.encode()
+    writer.write(b"%04x" % len(data) + data)
+    await writer.drain()
+
+    status = await reader.readexactly(4)
+    if status != b"OKAY":
+        length = int(await reader.readexactly(4), 16)
+        message = (await reader.readexactly(length)).decode("utf-8", "ignore")
+        raise RuntimeError(f"adb request {request!r} failed: {message}")
+
+
+async def adb_connect(
+    serial: str, service: str
+) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    """Open a device service (e.g. ``shell:...``) straight on the adb server
+
+    Talks the adb server's wire protocol over a local socket instead of
+    forking the adb CLI. The returned stream stays bound to the service
+    until the writer is closed.
+    """
+    reader, writer = await asyncio.open_connection(ADB_SERVER_HOST, ADB_SERVER_PORT)
+    try:
+        await _adb_request(reader, writer, f"host:transport:{serial}")
+        await _adb_request(reader, writer, service)
+    except BaseException:
+        writer.close()
+        raise
+    return reader, writer
+
+
+async def _adb_host_command(request: str):
+    reader, writer = await asyncio.open_connection(ADB_SERVER_HOST, ADB_SERVER_PORT)
+    try:
+        await _adb_request(reader, writer, request)
+    finally:
+        writer.close()
+
+
+async def adb_forward(serial: str, local: str, remote: str):
+    """Forward a host socket to a device socket (``adb forward``)"""
+    await _adb_host_command(f"host-serial:{serial}:forward:{local};{remote}")
+
+
+async def adb_remove_forward(serial: str, local: str):
+    """Remove a forward (``adb forward --remove``)"""
+    await _adb_host_command(f"host-serial:{serial}:killforward:{local}")
+
+
+async def _sync_status(reader: asyncio.StreamReader, request: str):
+    header = await reader.readexactly(8)
+    if header[:4] == b"FAIL":
+        length = struct.unpack("<I", header[4:])[0]
+        message = (await reader.readexactly(length)).decode("utf-8", "ignore")
+        raise RuntimeError(f"adb sync {request} failed: {message}")
+    return header
+
+
+async def adb_push(serial: str, local_path: str, remote_path: str, mode=0o644):
+    """Push a file over the sync protocol, skipping it if already on the device
+
+    The remote file is considered current when its size matches the local one.
+    """
+    reader, writer = await adb_connect(serial, "sync:")
+    try:
+        local_size = os.path.getsize(local_path)
+        path = remote_path.encode()
+
+        writer.write(b"STAT" + struct.pack("<I", len(path)) + path)
+        await writer.drain()
+        reply = await reader.readexactly(16)
+        _, remote_mode, remote_size, _ = struct.unpack("<4sIII", reply)
+        if remote_mode and remote_size == local_size:
+            return False
+
+        spec = f"{remote_path},{mode}".encode()
+        writer.write(b"SEND" + struct.pack("<I", len(spec)) + spec)
+        with open(local_path, "rb") as f:
+            while chunk := f.read(SYNC_CHUNK_SIZE):
+                writer.write(b"DATA" + struct.pack("<I", len(chunk)) + chunk)
+                await writer.drain()
+        writer.write(b"DONE" + struct.pack("<I", int(time.time())))
+        await writer.drain()
+
+        await _sync_status(reader, f"push {remote_path}")
+        return True
+
+    finally:
+        writer.close()
+
+
 async def adb_wait_for_boot(serial: str, timeout=120):
     """Wait for Android device to complete boot process"""
     logger.info(f"⏳ Waiting for {serial} to complete boot (timeout: {timeout}s)...")
 
     # Wait for device to appear
-    rc, _ = await run(f"adb -s {shlex.quote(serial)} wait-for-device")
+    rc, _ = await run("adb", "-s", serial, "wait-for-device")
     if rc != 0:
         raise RuntimeError(f"ADB wait-for-device failed for {serial}")
 
-    # Wait for boot completion properties
-    for i in range(timeout):
-        rc, out = await run(
-            f"adb -s {shlex.quote(serial)} shell getprop sys.boot_completed"
-        )
-        if out.strip() == "1":
-            rc2, out2 = await run(
-                f"adb -s {shlex.quote(serial)} shell getprop dev.bootcomplete"
+    # Wait for boot completion properties over one persistent shell,
+    # backing off from 0.2s up to 5s between checks
+    shell = adb_shell(serial)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    delay = 0.2
+    next_log = 10
+
+    while (remaining := deadline - loop.time()) > 0:
+        try:
+            rc, out = await asyncio.wait_for(
+                shell.execute("getprop sys.boot_completed; getprop dev.bootcomplete"),
+                timeout=remaining,
             )
-            if out2.strip() == "1":
-                logger.info(f"✅ {serial} boot completed!")
+        except Exception as e:
+            logger.debug(f"Boot check on {serial} failed: {e}")
+            out = ""
 
-                # Unlock screen if locked
-                await run(f"adb -s {shlex.quote(serial)} shell input keyevent 82")
+        if out.split() == ["1", "1"]:
+            logger.info(f"✅ {serial} boot completed!")
 
-                # Disable animations for better stability
-                await run(
-                    f"adb -s {shlex.quote(serial)} shell settings put global window_animation_scale 0"
-                )
-                await run(
-                    f"adb -s {shlex.quote(serial)} shell settings put global transition_animation_scale 0"
-                )
-                await run(
-                    f"adb -s {shlex.quote(serial)} shell settings put global animator_duration_scale 0"
-                )
+            # Unlock screen and disable animations for better stability
+            await shell.execute(
+                "input keyevent 82; "
+                "settings put global window_animation_scale 0; "
+                "settings put global transition_animation_scale 0; "
+                "settings put global animator_duration_scale 0"
+            )
 
-                logger.info(f"🎬 Animations disabled on {serial}")
-                return
+            logger.info(f"🎬 Animations disabled on {serial}")
+            return
 
-        if i % 10 == 0 and i > 0:
-            logger.info(f"⏳ Still waiting for boot... ({i}s elapsed)")
+        elapsed = timeout - remaining
+        if elapsed >= next_log:
+            logger.info(f"⏳ Still waiting for boot... ({int(elapsed)}s elapsed)")
+            next_log += 10
 
-        await asyncio.sleep(1)
+        await asyncio.sleep(min(delay, max(deadline - loop.time(), 0)))
+        delay = min(delay * 2, 5)
 
     raise TimeoutError(f"Android device {serial} did not complete boot in {timeout}s")
 
@@ -65,13 +299,13 @@ async def adb_wait_for_boot(serial: str, timeout=120):
 async def adb_ensure_connected(serial: str):
     """Ensure ADB is connected to the device, reconnect if needed"""
     try:
-        rc, out = await run("adb devices")
+        rc, out = await run("adb", "devices")
         if serial in out:
             return True
 
         # Try to connect
         logger.info(f"🔌 Connecting to {serial}...")
-        rc, out = await run(f"adb connect {serial}")
+        rc, out = await run("adb", "connect", serial)
 
         if "connected" in out.lower() or "already connected" in out.lower():
             logger.info(f"✅ Connected to {serial}")
@@ -88,13 +322,14 @@ async def adb_ensure_connected(serial: str):
 async def adb_start_server():
     """Start ADB server with recommended settings"""
     try:
-        # Kill existing server
-        await run("adb kill-server")
+        # Kill existing server (this also drops every persistent shell)
+        await adb_close_shells()
+        await run("adb", "kill-server")
         await asyncio.sleep(1)
 
         # Start server
         logger.info("🚀 Starting ADB server...")
-        rc, out = await run("adb start-server")
+        rc, out = await run("adb", "start-server")
 
         if rc == 0:
             logger.info("✅ ADB server started successfully")
@@ -0,0 +1,79 @@
+"""Redis read-through cache for hot single-row API lookups"""
+
+import functools
+import logging
+from typing import Type
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+from redis import asyncio as aioredis
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+redis = aioredis.from_url(settings.REDIS_URL, decode_responses=False)
+
+# Part of every key; bump it when the stored format changes so entries
+# written by an older deploy are never read back
+CACHE_VERSION = 2
+
+
+def cache_key(prefix: str, object_id) -> str:
+    return f"{prefix}:v{CACHE_VERSION}:{object_id}"
+
+
+def redis_cached(prefix: str, key: str, model: Type[BaseModel], ttl: int = 30):
+    """Cache a handler's result in Redis under ``cache_key(prefix, kwargs[key])``
+
+    The result is stored as ``model``'s JSON, never as the ORM object, so
+    cached entries outlive mapper changes and hits are served as-is.
+    Cache errors are logged and fall through to the wrapped handler so a
+    Redis outage never takes the API down with it.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            object_key = cache_key(prefix, kwargs[key])
+
+            try:
+                if (cached := await redis.get(object_key)) is not None:
+                    return Response(content=cached, media_type="application/json")
+            except Exception as e:
+                logger.warning(f"Cache read failed for {object_key}: {e}")
+
+            result = await func(*args, **kwargs)
+            data = model.model_validate(result, from_attributes=True)
+            content = data.model_dump_json()
+
+            try:
+                await redis.setex(object_key, ttl, content)
+            except Exception as e:
+                logger.warning(f"Cache write failed for {object_key}: {e}")
+
+            return Response(content=content, media_type="application/json")
+
+        return wrapper
+
+    return decorator
+
+
+async def invalidate(prefix: str, object_id):
+    """Drop a cached entry after the underlying row changed"""
+    try:
+        await redis.delete(cache_key(prefix, object_id))
+    except Exception as e:
+        logger.warning(f"Cache invalidation failed for {prefix}:{object_id}: {e}")
+
+
+async def invalidate_many(prefix: str, object_ids):
+    """Drop the cached entries of several rows changed by one bulk UPDATE"""
+    if not object_ids:
+        return
+    try:
+        await redis.delete(*(cache_key(prefix, object_id) for object_id in object_ids))
+    except Exception as e:
+        logger.warning(
+            f"Cache invalidation failed for {len(object_ids)} {prefix}s: {e}"
+        )
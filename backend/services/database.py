@@ -1,5 +1,5 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import declarative_base
+from sqlalchemy.orm import Session as OrmSession, declarative_base, relationship
 from sqlalchemy import (
     Column,
     Integer,
@@ -9,18 +9,57 @@ from sqlalchemy import (
     ForeignKey,
     Text,
     Float,
+    Index,
+    event,
+    func,
+    text,
 )
-from datetime import datetime
+from sqlalchemy.exc import DBAPIError
+import asyncio
+import logging
 from config import settings
+from services.db_pool import CONNECTION_ERRORS, CircuitBreaker, QueryMonitor
+
+logger = logging.getLogger(__name__)
 
 # Convert PostgreSQL URL to async version
 DATABASE_URL = settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
 
-# Create async engine
-engine = create_async_engine(DATABASE_URL, echo=True, future=True)
+# Create async engine (pool class defaults to AsyncAdaptedQueuePool)
+engine = create_async_engine(
+    DATABASE_URL,
+    echo=settings.DEBUG,
+    future=True,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_pre_ping=True,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_use_lifo=True,
+    connect_args={"prepared_statement_cache_size": 500},
+)
+
+# Fail fast while Postgres is unreachable and log slow statements
+db_breaker = CircuitBreaker()
+query_monitor = QueryMonitor()
+query_monitor.attach(engine)
+
+
+class TrackedSession(OrmSession):
+    """Sync session behind AsyncSession that notes when it used a connection"""
+
+
+@event.listens_for(TrackedSession, "after_begin")
+def _mark_connected(session, transaction, connection):
+    session.info["connected"] = True
+
 
 # Create session factory
-async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+async_session = async_sessionmaker(
+    engine,
+    class_=AsyncSession,
+    sync_session_class=TrackedSession,
+    expire_on_commit=False,
+)
 
 # Base class for models
 Base = declarative_base()
@@ -38,9 +77,12 @@ class User(Base):
     hashed_password = Column(String(255), nullable=False)
     is_active = Column(Boolean, default=True)
     is_admin = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
     max_devices = Column(Integer, default=5)
 
+    devices = relationship("Device", back_populates="user", passive_deletes=True)
+    sessions = relationship("Session", back_populates="user", passive_deletes=True)
+
 
 class Device(Base):
     """Android virtual device model"""
@@ -53,15 +95,29 @@ class Device(Base):
     device_name = Column(String(100), nullable=False)
     android_version = Column(String(20), default="11.0")
     device_model = Column(String(50), default="Pixel_5")
-    status = Column(String(20), default="stopped")  # stopped, starting, running, error
+    status = Column(String(20), default="stopped")  # stopped, starting, running, stopping, error
     ip_address = Column(String(50))
     webrtc_port = Column(Integer)
     adb_port = Column(Integer)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    last_used = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used = Column(DateTime(timezone=True), server_default=func.now())
     cpu_allocated = Column(Integer, default=2)  # CPU cores
     ram_allocated = Column(Integer, default=2048)  # MB
 
+    user = relationship("User", back_populates="devices")
+    sessions = relationship("Session", back_populates="device", passive_deletes=True)
+    metrics = relationship("Metric", back_populates="device", passive_deletes=True)
+
+    __table_args__ = (
+        Index("ix_devices_user_status", "user_id", "status"),
+        # Idle/LRU scans in the orchestrator only look at running devices
+        Index(
+            "ix_devices_running_last_used",
+            "last_used",
+            postgresql_where=text("status = 'running'"),
+        ),
+    )
+
 
 class Session(Base):
     """User session with virtual device"""
@@ -73,29 +129,173 @@ class Session(Base):
     device_id = Column(Integer, ForeignKey("devices.id"), nullable=False)
     session_token = Column(String(255), unique=True, index=True)
     status = Column(String(20), default="active")  # active, disconnected, ended
-    started_at = Column(DateTime, default=datetime.utcnow)
-    ended_at = Column(DateTime, nullable=True)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    ended_at = Column(DateTime(timezone=True), nullable=True)
     data_transferred = Column(Float, default=0.0)  # MB
 
+    user = relationship("User", back_populates="sessions")
+    device = relationship("Device", back_populates="sessions")
+
+    __table_args__ = (
+        # Stale-session cleanup only looks at disconnected sessions
+        Index(
+            "ix_sessions_disconnected_started_at",
+            "started_at",
+            postgresql_where=text("status = 'disconnected'"),
+        ),
+    )
+
 
 class Metric(Base):
     """Device performance metrics"""
 
     __tablename__ = "metrics"
 
-    id = Column(Integer, primary_key=True, index=True)
+    # Hypertable unique keys must include the time column
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     device_id = Column(Integer, ForeignKey("devices.id"), nullable=False)
     cpu_usage = Column(Float, default=0.0)  # percentage
     ram_usage = Column(Float, default=0.0)  # MB
     network_in = Column(Float, default=0.0)  # MB
     network_out = Column(Float, default=0.0)  # MB
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(
+        DateTime(timezone=True), primary_key=True, server_default=func.now()
+    )
+
+    device = relationship("Device", back_populates="metrics")
+
+    # Append-only time series: BRIN stays tiny and fits timestamp range scans
+    __table_args__ = (
+        Index("ix_metrics_timestamp_brin", "timestamp", postgresql_using="brin"),
+    )
+
+
+async def _migrate_naive_timestamps(conn):
+    """Convert timestamp columns created before timezone support to timestamptz"""
+    # create_all never alters existing columns, and asyncpg refuses to bind the
+    # aware datetimes the app now uses to a naive timestamp parameter
+    for table in Base.metadata.sorted_tables:
+        for column in table.columns:
+            if not (isinstance(column.type, DateTime) and column.type.timezone):
+                continue
+            naive = await conn.scalar(
+                text(
+                    "SELECT 1 FROM information_schema.columns "
+                    "WHERE table_schema = current_schema() "
+                    "AND table_name = :table AND column_name = :column "
+                    "AND data_type = 'timestamp without time zone'"
+                ),
+                {"table": table.name, "column": column.name},
+            )
+            if not naive:
+                continue
+
+            # Naive values were written with datetime.utcnow()
+            logger.info(f"🔧 Migrating {table.name}.{column.name} to timestamptz")
+            await conn.execute(
+                text(
+                    f'ALTER TABLE {table.name} ALTER COLUMN "{column.name}" '
+                    f"TYPE timestamptz USING \"{column.name}\" AT TIME ZONE 'UTC'"
+                )
+            )
+
+
+async def _migrate_metrics_primary_key(conn):
+    """Widen an id-only metrics primary key to (id, timestamp)"""
+    # Tables created before the hypertable change keep their old key, which
+    # create_hypertable rejects because it lacks the partitioning column
+    constraint = await conn.scalar(
+        text(
+            "SELECT conname FROM pg_constraint c "
+            "WHERE conrelid = 'metrics'::regclass AND contype = 'p' "
+            "AND NOT EXISTS (SELECT 1 FROM pg_attribute a "
+            "WHERE a.attrelid = c.conrelid AND a.attnum = ANY(c.conkey) "
+            "AND a.attname = 'timestamp')"
+        )
+    )
+    if not constraint:
+        return
+
+    logger.info(f"🔧 Migrating metrics primary key {constraint} to (id, timestamp)")
+    await conn.execute(
+        text("UPDATE metrics SET timestamp = now() WHERE timestamp IS NULL")
+    )
+    await conn.execute(
+        text(
+            f'ALTER TABLE metrics DROP CONSTRAINT "{constraint}", '
+            "ADD PRIMARY KEY (id, timestamp)"
+        )
+    )
+
+
+async def _setup_metrics_hypertable(conn):
+    """Turn metrics into a compressed TimescaleDB hypertable when available"""
+    available = await conn.scalar(
+        text("SELECT 1 FROM pg_available_extensions WHERE name = 'timescaledb'")
+    )
+    if not available:
+        logger.warning("TimescaleDB not available, metrics stay a plain table")
+        return
+
+    await conn.execute(text("CREATE EXTENSION IF NOT EXISTS timescaledb"))
+    await _migrate_metrics_primary_key(conn)
+    # The BRIN index already covers time-range scans, skip Timescale's btree
+    await conn.execute(
+        text(
+            "SELECT create_hypertable('metrics', 'timestamp', if_not_exists => TRUE, "
+            "migrate_data => TRUE, create_default_indexes => FALSE)"
+        )
+    )
+
+    compressed = await conn.scalar(
+        text(
+            "SELECT compression_enabled FROM timescaledb_information.hypertables "
+            "WHERE hypertable_name = 'metrics'"
+        )
+    )
+    if not compressed:
+        await conn.execute(
+            text(
+                "ALTER TABLE metrics SET (timescaledb.compress, "
+                "timescaledb.compress_segmentby = 'device_id', "
+                "timescaledb.compress_orderby = 'timestamp DESC')"
+            )
+        )
+
+    await conn.execute(
+        text(
+            "SELECT add_compression_policy('metrics', CAST(:after AS INTERVAL), "
+            "if_not_exists => TRUE)"
+        ),
+        {"after": settings.METRICS_COMPRESS_AFTER},
+    )
+    await conn.execute(
+        text(
+            "SELECT add_retention_policy('metrics', CAST(:retention AS INTERVAL), "
+            "if_not_exists => TRUE)"
+        ),
+        {"retention": settings.METRICS_RETENTION},
+    )
 
 
 async def init_db():
-    """Initialize database tables"""
+    """Initialize database tables and warm up the connection pool"""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await _migrate_naive_timestamps(conn)
+
+    # Own transaction: a failed Timescale setup must not take the app down
+    try:
+        async with engine.begin() as conn:
+            await _setup_metrics_hypertable(conn)
+    except DBAPIError as e:
+        logger.warning(f"⚠️ Metrics hypertable setup failed, keeping plain table: {e}")
+
+    # Open pool_size connections up front so first requests skip the handshake
+    connections = await asyncio.gather(
+        *(engine.connect() for _ in range(settings.DB_POOL_SIZE))
+    )
+    await asyncio.gather(*(conn.close() for conn in connections))
 
 
 async def close_db():
@@ -105,5 +305,18 @@ async def close_db():
 
 async def get_session() -> AsyncSession:
     """Get database session"""
+    probe = db_breaker.check()
+    failed = False
     async with async_session() as session:
-        yield session
+        try:
+            yield session
+        except CONNECTION_ERRORS:
+            failed = True
+            db_breaker.record_failure()
+            raise
+        finally:
+            # Only a request that checked out a connection says the DB is up
+            if not failed and session.info.get("connected"):
+                db_breaker.record_success()
+            elif probe:
+                db_breaker.release_probe()
@@ -0,0 +1,203 @@
+"""Connection-pool health: circuit breaker, slow-query and pool-load monitoring"""
+
+import asyncio
+import functools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the database itself is unreachable, not that a query is wrong
+CONNECTION_ERRORS = (OperationalError, InterfaceError, ConnectionError, OSError)
+
+# Per-task statement counter, set while count_queries() is active
+_query_counter: ContextVar = ContextVar("query_counter", default=None)
+
+
+class CircuitOpenError(Exception):
+    """Raised when the database circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Stops hitting the database after repeated connection failures
+
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    callers fail fast for ``reset_timeout`` seconds. After that it is half-open:
+    exactly one caller is let through as a probe while the rest keep failing
+    fast; the probe's success closes the breaker, its failure reopens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def is_open(self) -> bool:
+        """Whether calls fail fast: cooling down, or waiting on the probe"""
+        if self.opened_at is None:
+            return False
+        return self.probing or time.monotonic() - self.opened_at < self.reset_timeout
+
+    def check(self) -> bool:
+        """Raise CircuitOpenError if calls should currently fail fast
+
+        Returns True if the caller is the half-open probe, which must end with
+        record_success, record_failure or release_probe.
+        """
+        if self.opened_at is None:
+            return False
+        if self.is_open:
+            raise CircuitOpenError("Database temporarily unavailable")
+
+        self.probing = True
+        logger.info("Database circuit breaker half-open, probing")
+        return True
+
+    def release_probe(self):
+        """End a probe that never reached the database; the next caller probes"""
+        self.probing = False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info("✅ Database circuit breaker closed")
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        probe_failed, self.probing = self.probing, False
+        if self.failures >= self.failure_threshold:
+            if probe_failed:
+                logger.error("❌ Database probe failed, circuit breaker reopened")
+            elif self.opened_at is None:
+                logger.error(
+                    f"❌ Database circuit breaker opened after {self.failures} failures"
+                )
+            self.opened_at = time.monotonic()
+
+
+class QueryMonitor:
+    """Logs statements slower than a threshold via cursor execute events"""
+
+    def __init__(self, slow_query_seconds: float = 0.5):
+        self.slow_query_seconds = slow_query_seconds
+        self.query_count = 0
+        self.slow_query_count = 0
+
+    def attach(self, engine):
+        sync_engine = engine.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", self._before_execute)
+        event.listen(sync_engine, "after_cursor_execute", self._after_execute)
+
+    def _before_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+        if (counter := _query_counter.get()) is not None:
+            counter[0] += 1
+
+    def _after_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        self.query_count += 1
+        if elapsed >= self.slow_query_seconds:
+            self.slow_query_count += 1
+            logger.warning(f"🐢 Slow query ({elapsed:.3f}s): {statement[:200]}")
+
+
+@contextmanager
+def count_queries():
+    """Count statements run by the current task: ``with count_queries() as n``
+
+    ``n[0]`` holds the running count; it is fed by the attached QueryMonitor.
+    """
+    counter = [0]
+    token = _query_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _query_counter.reset(token)
+
+
+def assert_max_queries(limit: int):
+    """Warn when a coroutine runs more than ``limit`` statements (DEBUG only)
+
+    Flags N+1 regressions in fixed-cost code paths without breaking the loop
+    that runs them; tests fail hard via the assert_max_queries fixture instead.
+    A no-op in production.
+    """
+
+    def decorator(func):
+        if not settings.DEBUG:
+            return func
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with count_queries() as counter:
+                result = await func(*args, **kwargs)
+            if counter[0] > limit:
+                logger.warning(
+                    f"⚠️ {func.__qualname__} ran {counter[0]} queries (limit {limit})"
+                )
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+class LoadMonitor:
+    """Samples pool utilization and host CPU, warning when the pool saturates"""
+
+    def __init__(self, engine, capacity: int, interval: float = 5.0):
+        self.engine = engine
+        self.capacity = capacity
+        self.interval = interval
+        self.running = False
+        self.task = None
+
+    async def start(self):
+        self.running = True
+        self.task = asyncio.create_task(self._sample())
+
+    async def stop(self):
+        self.running = False
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+
+    async def _sample(self):
+        import psutil
+
+        while self.running:
+            try:
+                checked_out = self.engine.pool.checkedout()
+                capacity = self.capacity
+                cpu_percent = psutil.cpu_percent(interval=None)
+
+                if checked_out >= capacity:
+                    logger.warning(
+                        f"DB pool saturated: {checked_out}/{capacity} connections "
+                        f"in use (CPU {cpu_percent}%)"
+                    )
+                else:
+                    logger.debug(
+                        f"DB pool: {checked_out}/{capacity} in use (CPU {cpu_percent}%)"
+                    )
+
+            except Exception as e:
+                logger.error(f"Error sampling DB pool load: {e}")
+
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,99 @@
+"""In-process view of running devices for the orchestrator's cleanup loops"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import bindparam, select
+
+from services.database import Device
+
+logger = logging.getLogger(__name__)
+
+_RUNNING_DEVICES = select(
+    Device.id,
+    Device.container_id,
+    Device.webrtc_port,
+    Device.adb_port,
+    Device.last_used,
+).where(Device.status == "running")
+
+_RUNNING_DEVICES_BY_ID = _RUNNING_DEVICES.where(
+    Device.id.in_(bindparam("device_ids", expanding=True))
+)
+
+
+@dataclass
+class RunningDevice:
+    """The fields of a running device needed to find and stop it"""
+
+    id: int
+    container_id: Optional[str]
+    webrtc_port: Optional[int]
+    adb_port: Optional[int]
+    last_used: datetime
+
+
+class DeviceRegistry:
+    """Tracks running devices in memory, updated by VMManager on start/stop
+
+    ``changed`` is set on every transition so loops can wake immediately
+    instead of polling the database on a timer.
+    """
+
+    def __init__(self):
+        self.devices: Dict[int, RunningDevice] = {}
+        self.changed = asyncio.Event()
+
+    async def load(self, db, device_ids: Optional[List[int]] = None):
+        """Seed the registry from the devices table, or resync some devices"""
+        if device_ids is None:
+            self.devices = {}
+            result = await db.execute(_RUNNING_DEVICES)
+        else:
+            for device_id in device_ids:
+                self.devices.pop(device_id, None)
+            result = await db.execute(
+                _RUNNING_DEVICES_BY_ID, {"device_ids": device_ids}
+            )
+
+        self.devices.update({row.id: RunningDevice(*row) for row in result})
+        self.changed.set()
+
+    def mark_running(self, device_id: int, container_id, webrtc_port, adb_port):
+        self.devices[device_id] = RunningDevice(
+            id=device_id,
+            container_id=container_id,
+            webrtc_port=webrtc_port,
+            adb_port=adb_port,
+            last_used=datetime.now(timezone.utc),
+        )
+        self.changed.set()
+
+    def mark_stopped(self, device_id: int):
+        if self.devices.pop(device_id, None) is not None:
+            self.changed.set()
+
+    def idle_since(self, threshold: datetime) -> List[RunningDevice]:
+        """Running devices not used since ``threshold``"""
+        return [d for d in self.devices.values() if d.last_used < threshold]
+
+    def least_recently_used(self, count: int) -> List[RunningDevice]:
+        return sorted(self.devices.values(), key=lambda d: d.last_used)[:count]
+
+    def oldest_last_used(self) -> Optional[datetime]:
+        return min((d.last_used for d in self.devices.values()), default=None)
+
+    async def wait_for_change(self, timeout: float):
+        """Sleep until a device changes state or ``timeout`` seconds pass"""
+        try:
+            await asyncio.wait_for(self.changed.wait(), max(timeout, 0))
+        except asyncio.TimeoutError:
+            pass
+        self.changed.clear()
+
+
+# Global device registry instance
+device_registry = DeviceRegistry()
@@ -1,35 +1,122 @@
-"""H.264 streaming using scrcpy and ffmpeg for low-latency Android screen capture"""
+"""H.264 streaming using scrcpy or screenrecord for low-latency Android screen capture"""
 
 import asyncio
+import fractions
 import logging
-from typing import Optional
+import struct
+import time
+
+from config import settings
+from services.adb_utils import adb_connect, adb_forward, adb_push, adb_remove_forward
 
 logger = logging.getLogger(__name__)
 
 # Check for aiortc availability
 try:
-    from aiortc.contrib.media import MediaPlayer
+    import av
+    from aiortc.mediastreams import MediaStreamError, MediaStreamTrack
 
     AIORTC_AVAILABLE = True
 except ImportError:
     logger.warning("aiortc not available - H.264 streaming will not work")
-    MediaPlayer = None
+    av = None
+    MediaStreamError = None
+    MediaStreamTrack = object
     AIORTC_AVAILABLE = False
 
+SCRCPY_PORT = 27183
+SCRCPY_SERVER_JAR = "/usr/local/bin/scrcpy-server.jar"
+SCRCPY_DEVICE_JAR = "/data/local/tmp/scrcpy-server.jar"
+SCRCPY_HEADER = struct.Struct(">QI")  # PTS + flags, packet size
+SCRCPY_FLAG_CONFIG = 1 << 63
+SCRCPY_FLAG_KEY_FRAME = 1 << 62
+SCRCPY_PTS_MASK = SCRCPY_FLAG_KEY_FRAME - 1
+SCRCPY_TIME_BASE = fractions.Fraction(1, 1_000_000)  # scrcpy PTS are in µs
+
+VIDEO_TIME_BASE = fractions.Fraction(1, 90000)
+READ_CHUNK_SIZE = 65536
+
+# Capture options depend only on settings, so both command lines are built once
+SCRCPY_SERVER_CMD = " ".join(
+    [
+        f"CLASSPATH={SCRCPY_DEVICE_JAR}",
+        "app_process",
+        "/",
+        "com.genymobile.scrcpy.Server",
+        "2.3.1",
+        "tunnel_forward=true",
+        "control=false",
+        "audio=false",
+        "video_codec=h264",
+        "send_device_meta=false",
+        "send_codec_meta=false",
+        f"video_bit_rate={settings.VIDEO_BIT_RATE}",
+        "max_fps=60",
+        "lock_video_orientation=0",
+        f"max_size={max(settings.VIDEO_WIDTH, settings.VIDEO_HEIGHT)}",
+    ]
+)
+SCREENRECORD_ARGS = (
+    "exec-out",
+    "screenrecord",
+    "--output-format=h264",
+    "--size",
+    f"{settings.VIDEO_WIDTH}x{settings.VIDEO_HEIGHT}",
+    "--bit-rate",
+    str(settings.VIDEO_BIT_RATE),
+    "-",
+)
+PACKET_QUEUE_SIZE = 120
+
+
+class H264Track(MediaStreamTrack):
+    """Video track yielding encoded H.264 packets that aiortc sends as-is
+
+    aiortc packetizes ``av.Packet`` objects straight into RTP without
+    decoding or re-encoding, as long as H.264 is the negotiated codec.
+    """
+
+    kind = "video"
+
+    def __init__(self):
+        super().__init__()
+        self.queue = asyncio.Queue(maxsize=PACKET_QUEUE_SIZE)
+
+    async def put(self, packet):
+        await self.queue.put(packet)
+
+    async def recv(self):
+        if self.readyState != "live":
+            raise MediaStreamError
+
+        packet = await self.queue.get()
+        if packet is None:
+            self.stop()
+            raise MediaStreamError
+        return packet
+
+    def end(self):
+        """Signal end of stream to the consumer"""
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            self.stop()
+
 
 class H264Player:
-    """H.264 player using scrcpy + ffmpeg pipeline for low-latency streaming"""
+    """H.264 player reading scrcpy's encoded stream straight into aiortc"""
 
     def __init__(self, device_serial: str):
         self.device_serial = device_serial
-        self.scrcpy_proc = None
-        self.ffmpeg_proc = None
-        self.player = None
-        self.pipe_path = None
+        self.scrcpy_shell = None
+        self.shell_task = None
+        self.writer = None
+        self.reader_task = None
+        self.track = None
         logger.info(f"H264Player initialized for device {device_serial}")
 
     async def start(self):
-        """Start scrcpy server and ffmpeg remuxer pipeline"""
+        """Start scrcpy server and forward its packets to the video track"""
         if not AIORTC_AVAILABLE:
             raise RuntimeError("aiortc not available - cannot start H.264 player")
 
@@ -39,129 +126,27 @@ class H264Player:
             logger.info(f"🎥 Starting scrcpy server for {self.device_serial}...")
 
             # Push scrcpy server to device if needed
-            push_cmd = [
-                "adb",
-                "-s",
-                self.device_serial,
-                "push",
-                "/usr/local/bin/scrcpy-server.jar",
-                "/data/local/tmp/scrcpy-server.jar",
-            ]
-            push_proc = await asyncio.create_subprocess_exec(
-                *push_cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
-            await push_proc.communicate()
+            await adb_push(self.device_serial, SCRCPY_SERVER_JAR, SCRCPY_DEVICE_JAR)
 
             # Start scrcpy server on device (streams to port 27183)
-            scrcpy_cmd = [
-                "adb",
-                "-s",
-                self.device_serial,
-                "shell",
-                "CLASSPATH=/data/local/tmp/scrcpy-server.jar",
-                "app_process",
-                "/",
-                "com.genymobile.scrcpy.Server",
-                "2.3.1",
-                "tunnel_forward=true",
-                "control=false",
-                "video_bit_rate=8000000",
-                "max_fps=60",
-                "lock_video_orientation=0",
-                "max_size=1280",
-            ]
-
-            self.scrcpy_proc = await asyncio.create_subprocess_exec(
-                *scrcpy_cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
+            # Only the video socket is opened; each packet keeps its 12-byte
+            # frame header so PTS and config/keyframe flags survive.
+            # The server lives as long as this shell stream stays open
+            shell_output, self.scrcpy_shell = await adb_connect(
+                self.device_serial, "shell:" + SCRCPY_SERVER_CMD
             )
-
-            # Wait a bit for scrcpy to initialize
-            await asyncio.sleep(2)
+            self.shell_task = asyncio.create_task(self._log_shell(shell_output))
 
             # Forward the port from device to host
-            forward_cmd = [
-                "adb",
-                "-s",
-                self.device_serial,
-                "forward",
-                "tcp:27183",
-                "localabstract:scrcpy",
-            ]
-            forward_proc = await asyncio.create_subprocess_exec(
-                *forward_cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
+            await adb_forward(
+                self.device_serial, f"tcp:{SCRCPY_PORT}", "localabstract:scrcpy"
             )
-            await forward_proc.communicate()
 
             logger.info("✅ Scrcpy server started, port forwarded")
 
-            # Start ffmpeg to remux H.264 from TCP to MPEGTS on stdout
-            # This allows aiortc MediaPlayer to consume the stream
-            logger.info("🎬 Starting ffmpeg remuxer...")
-
-            ffmpeg_cmd = [
-                "ffmpeg",
-                "-i",
-                "tcp://127.0.0.1:27183",
-                "-c",
-                "copy",  # No re-encoding, just copy H.264
-                "-f",
-                "mpegts",
-                "pipe:1",
-            ]
-
-            self.ffmpeg_proc = await asyncio.create_subprocess_exec(
-                *ffmpeg_cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.DEVNULL,
-            )
-
-            logger.info("✅ FFmpeg remuxer started")
-
-            # Create MediaPlayer to read from stdin (ffmpeg pipes to it)
-            # We need to create a custom player that reads from the process
-            import os
-            import tempfile
-
-            # Create a named pipe for ffmpeg output
-            self.pipe_path = f"/tmp/scrcpy_{self.device_serial.replace(':', '_')}.ts"
-            try:
-                os.remove(self.pipe_path)
-            except:
-                pass
-            os.mkfifo(self.pipe_path)
-
-            # Restart ffmpeg to write to the named pipe
-            self.ffmpeg_proc.kill()
-            await self.ffmpeg_proc.wait()
-
-            ffmpeg_cmd = [
-                "ffmpeg",
-                "-i",
-                "tcp://127.0.0.1:27183",
-                "-c",
-                "copy",  # No re-encoding, just copy H.264
-                "-f",
-                "mpegts",
-                self.pipe_path,
-            ]
-
-            self.ffmpeg_proc = await asyncio.create_subprocess_exec(
-                *ffmpeg_cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.DEVNULL,
-            )
-
-            # Wait a moment for pipe to be ready
-            await asyncio.sleep(0.5)
-
-            # Create MediaPlayer from the named pipe
-            self.player = MediaPlayer(self.pipe_path, format="mpegts")
+            reader, self.writer = await self._connect_video()
+            self.track = H264Track()
+            self.reader_task = asyncio.create_task(self._read_packets(reader))
 
             logger.info("✅ H.264 pipeline ready!")
             return True
@@ -171,56 +156,97 @@ class H264Player:
             await self.stop()
             raise
 
+    async def _connect_video(self, timeout: float = 10.0):
+        """Connect to the video socket once the scrcpy server is listening
+
+        The adb forward accepts connections before the server is up and then
+        drops them, so readiness is signalled by scrcpy's one dummy byte.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        delay = 0.05
+
+        while True:
+            reader, writer = await asyncio.open_connection("127.0.0.1", SCRCPY_PORT)
+            try:
+                await reader.readexactly(1)
+                return reader, writer
+            except asyncio.IncompleteReadError:
+                writer.close()
+
+            if loop.time() + delay > deadline:
+                raise TimeoutError("scrcpy server did not start in time")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+    async def _log_shell(self, reader: asyncio.StreamReader):
+        """Drain scrcpy's console output so the server never blocks writing it"""
+        while line := await reader.readline():
+            line = line.decode(errors="replace").rstrip()
+            logger.debug(f"scrcpy[{self.device_serial}]: {line}")
+        logger.info(f"Scrcpy server on {self.device_serial} exited")
+
+    async def _read_packets(self, reader: asyncio.StreamReader):
+        """Turn scrcpy's framed packets into av.Packets on the track"""
+        config = b""
+        try:
+            while True:
+                header = await reader.readexactly(SCRCPY_HEADER.size)
+                pts_and_flags, size = SCRCPY_HEADER.unpack(header)
+                data = await reader.readexactly(size)
+
+                # SPS/PPS arrive as a separate config packet; aiortc needs
+                # them in-band ahead of the next frame to start decoding.
+                if pts_and_flags & SCRCPY_FLAG_CONFIG:
+                    config = data
+                    continue
+                if config:
+                    data = config + data
+                    config = b""
+
+                packet = av.Packet(data)
+                packet.pts = pts_and_flags & SCRCPY_PTS_MASK
+                packet.time_base = SCRCPY_TIME_BASE
+                packet.is_keyframe = bool(pts_and_flags & SCRCPY_FLAG_KEY_FRAME)
+                await self.track.put(packet)
+
+        except asyncio.IncompleteReadError:
+            logger.info("Scrcpy video stream ended")
+        except Exception as e:
+            logger.error(f"❌ Error reading scrcpy stream: {e}")
+        finally:
+            self.track.end()
+
     def video(self):
-        """Get video track from the player"""
-        if self.player:
-            return self.player.video
-        return None
+        """Get the video track fed by scrcpy"""
+        return self.track
 
     async def stop(self):
         """Stop all processes in the pipeline"""
         try:
-            # Stop ffmpeg
-            if self.ffmpeg_proc:
-                try:
-                    self.ffmpeg_proc.kill()
-                    await self.ffmpeg_proc.wait()
-                except:
-                    pass
-
-            # Stop scrcpy
-            if self.scrcpy_proc:
-                try:
-                    self.scrcpy_proc.kill()
-                    await self.scrcpy_proc.wait()
-                except:
-                    pass
+            if self.reader_task:
+                self.reader_task.cancel()
+                await asyncio.gather(self.reader_task, return_exceptions=True)
+
+            if self.writer:
+                self.writer.close()
+
+            if self.track:
+                self.track.stop()
+
+            # Stop scrcpy by closing its shell stream
+            if self.scrcpy_shell:
+                self.scrcpy_shell.close()
+            if self.shell_task:
+                self.shell_task.cancel()
+                await asyncio.gather(self.shell_task, return_exceptions=True)
 
             # Remove port forward
             try:
-                remove_forward = await asyncio.create_subprocess_exec(
-                    "adb",
-                    "-s",
-                    self.device_serial,
-                    "forward",
-                    "--remove",
-                    "tcp:27183",
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE,
-                )
-                await remove_forward.communicate()
-            except:
+                await adb_remove_forward(self.device_serial, f"tcp:{SCRCPY_PORT}")
+            except Exception:
                 pass
 
-            # Remove named pipe
-            if self.pipe_path:
-                try:
-                    import os
-
-                    os.remove(self.pipe_path)
-                except:
-                    pass
-
             logger.info("🛑 H.264 player stopped")
 
         except Exception as e:
@@ -233,13 +259,12 @@ class ScreenrecordPlayer:
     def __init__(self, device_serial: str):
         self.device_serial = device_serial
         self.adb_proc = None
-        self.ffmpeg_proc = None
-        self.player = None
-        self.pipe_path = None
+        self.reader_task = None
+        self.track = None
         logger.info(f"ScreenrecordPlayer initialized for device {device_serial}")
 
     async def start(self):
-        """Start screenrecord + ffmpeg pipeline"""
+        """Start screenrecord and forward its packets to the video track"""
         if not AIORTC_AVAILABLE:
             raise RuntimeError(
                 "aiortc not available - cannot start screenrecord player"
@@ -249,62 +274,19 @@ class ScreenrecordPlayer:
             logger.info(f"🎥 Starting screenrecord for {self.device_serial}...")
 
             # Start ADB screenrecord
-            adb_cmd = [
+            self.adb_proc = await asyncio.create_subprocess_exec(
                 "adb",
                 "-s",
                 self.device_serial,
-                "exec-out",
-                "screenrecord",
-                "--output-format=h264",
-                "--size",
-                "1280x720",
-                "--bit-rate",
-                "8000000",
-                "-",
-            ]
-
-            self.adb_proc = await asyncio.create_subprocess_exec(
-                *adb_cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-            )
-
-            # Create a named pipe for ffmpeg output
-            import os
-
-            self.pipe_path = (
-                f"/tmp/screenrecord_{self.device_serial.replace(':', '_')}.ts"
-            )
-            try:
-                os.remove(self.pipe_path)
-            except:
-                pass
-            os.mkfifo(self.pipe_path)
-
-            # Start ffmpeg to remux from ADB stdout to named pipe
-            ffmpeg_cmd = [
-                "ffmpeg",
-                "-f",
-                "h264",
-                "-i",
-                "pipe:0",
-                "-c",
-                "copy",
-                "-f",
-                "mpegts",
-                self.pipe_path,
-            ]
-
-            self.ffmpeg_proc = await asyncio.create_subprocess_exec(
-                *ffmpeg_cmd,
-                stdin=self.adb_proc.stdout,
+                *SCREENRECORD_ARGS,
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.DEVNULL,
             )
 
-            # Wait for pipe to be ready
-            await asyncio.sleep(0.5)
-
-            # Create MediaPlayer from named pipe
-            self.player = MediaPlayer(self.pipe_path, format="mpegts")
+            self.track = H264Track()
+            self.reader_task = asyncio.create_task(
+                self._read_packets(self.adb_proc.stdout)
+            )
 
             logger.info("✅ Screenrecord pipeline ready!")
             return True
@@ -314,32 +296,43 @@ class ScreenrecordPlayer:
             await self.stop()
             raise
 
+    async def _read_packets(self, reader: asyncio.StreamReader):
+        """Split the raw Annex B stream into access units for the track"""
+        # The parser only finds NAL boundaries, it never decodes
+        parser = av.CodecContext.create("h264", "r")
+        start = time.monotonic()
+        try:
+            while chunk := await reader.read(READ_CHUNK_SIZE):
+                for packet in parser.parse(chunk):
+                    # Raw H.264 carries no timestamps, so stamp on arrival
+                    packet.pts = int((time.monotonic() - start) * 90000)
+                    packet.time_base = VIDEO_TIME_BASE
+                    await self.track.put(packet)
+
+            logger.info("Screenrecord stream ended")
+        except Exception as e:
+            logger.error(f"❌ Error reading screenrecord stream: {e}")
+        finally:
+            self.track.end()
+
     def video(self):
-        """Get video track from the player"""
-        if self.player:
-            return self.player.video
-        return None
+        """Get the video track fed by screenrecord"""
+        return self.track
 
     async def stop(self):
         """Stop all processes"""
         try:
-            if self.ffmpeg_proc:
-                self.ffmpeg_proc.kill()
-                await self.ffmpeg_proc.wait()
+            if self.reader_task:
+                self.reader_task.cancel()
+                await asyncio.gather(self.reader_task, return_exceptions=True)
+
+            if self.track:
+                self.track.stop()
 
             if self.adb_proc:
                 self.adb_proc.kill()
                 await self.adb_proc.wait()
 
-            # Remove named pipe
-            if self.pipe_path:
-                try:
-                    import os
-
-                    os.remove(self.pipe_path)
-                except:
-                    pass
-
             logger.info("🛑 Screenrecord player stopped")
 
         except Exception as e:
@@ -0,0 +1,133 @@
+"""Batched writer for the append-only metrics table"""
+
+import asyncio
+import logging
+from typing import Dict
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from services.database import async_session, Device, Metric
+from services.db_pool import CONNECTION_ERRORS
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 10_000
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 1.0  # seconds
+RETRY_DELAY = 5.0  # seconds, while the database is unreachable
+
+
+class MetricWriter:
+    """Buffers metric rows in a bounded queue and inserts them in batches"""
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.dropped = 0
+        self.pending = []  # rows taken off the queue and not yet committed
+        self.running = False
+        self.task = None
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize()
+
+    def record(self, metric: Dict):
+        """Queue a metric row; drops it if the writer is backed up"""
+        try:
+            self.queue.put_nowait(metric)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Metric queue full, dropped {self.dropped} rows so far")
+
+    async def start(self):
+        """Start the background flush task"""
+        self.running = True
+        self.task = asyncio.create_task(self._run())
+        logger.info("Metric writer started")
+
+    async def stop(self):
+        """Stop the flush task and write whatever is still queued"""
+        self.running = False
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+
+        # pending still holds a batch whose flush was cancelled mid-write
+        while not self.queue.empty():
+            self.pending.append(self.queue.get_nowait())
+        await self._flush()
+        logger.info("Metric writer stopped")
+
+    async def _run(self):
+        while self.running:
+            await self._fill_batch()
+            if not await self._flush():
+                await asyncio.sleep(RETRY_DELAY)
+
+    async def _fill_batch(self):
+        """Wait for one row, then collect more until the batch or interval fills"""
+        if not self.pending:
+            self.pending.append(await self.queue.get())
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + FLUSH_INTERVAL
+
+        while len(self.pending) < BATCH_SIZE:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                self.pending.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+    async def _flush(self) -> bool:
+        """Write the pending rows; False if they were kept to retry later"""
+        rows = self.pending
+        if not rows:
+            return True
+
+        try:
+            try:
+                await self._insert(rows)
+            except IntegrityError:
+                # Rows of a device deleted while they sat in the queue fail
+                # the whole batch, so retry with only the devices that exist
+                if rows := await self._without_deleted_devices(rows):
+                    await self._insert(rows)
+                else:
+                    self.pending = []
+        except CONNECTION_ERRORS as e:
+            logger.warning(
+                f"Database unreachable, keeping {len(rows)} metric rows: {e}"
+            )
+            return False
+        except Exception as e:
+            logger.error(f"Failed to write {len(rows)} metric rows: {e}")
+            self.pending = []
+        return True
+
+    async def _insert(self, rows):
+        async with async_session() as db:
+            await db.execute(insert(Metric), rows)
+            await db.commit()
+            # Cleared right after commit so a cancelled flush never loses rows
+            self.pending = []
+
+    async def _without_deleted_devices(self, rows):
+        device_ids = {row["device_id"] for row in rows}
+        async with async_session() as db:
+            existing = set(
+                await db.scalars(select(Device.id).where(Device.id.in_(device_ids)))
+            )
+
+        kept = [row for row in rows if row["device_id"] in existing]
+        logger.warning(
+            f"Dropped {len(rows) - len(kept)} metric rows of deleted devices"
+        )
+        return kept
+
+
+# Global metric writer instance
+metric_writer = MetricWriter()
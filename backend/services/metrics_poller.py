@@ -0,0 +1,96 @@
+"""Background poller that caches container metrics in Redis"""
+
+import asyncio
+import logging
+from typing import Dict, Optional
+
+import orjson
+
+from services.cache import redis
+from services.metric_writer import metric_writer
+from services.vm_manager import DockerRuntime, VMManager
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 5  # seconds
+METRICS_TTL = 10  # seconds
+LIST_FILTERS = orjson.dumps({"name": ["android-"]}).decode()
+
+
+def metrics_key(container_id: str) -> str:
+    return f"metrics:{container_id}"
+
+
+class MetricsPoller:
+    """Polls stats for all device containers and publishes them to Redis"""
+
+    def __init__(self, vm_manager: VMManager):
+        self.vm_manager = vm_manager
+        self.running = False
+        self.task = None
+
+    async def start(self):
+        """Start the polling task"""
+        self.running = True
+        self.task = asyncio.create_task(self._poll())
+        logger.info("Metrics poller started")
+
+    async def stop(self):
+        """Stop the polling task"""
+        self.running = False
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+        logger.info("Metrics poller stopped")
+
+    async def _poll(self):
+        while self.running:
+            try:
+                await self._collect()
+            except Exception as e:
+                logger.error(f"Error polling container metrics: {e}")
+
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def _collect(self):
+        containers = await self._list_device_containers()
+        if not containers:
+            return
+
+        results = await self.vm_manager.get_all_metrics(list(containers))
+
+        async with redis.pipeline(transaction=False) as pipe:
+            for container_id, metrics in results.items():
+                pipe.setex(
+                    metrics_key(container_id), METRICS_TTL, orjson.dumps(metrics)
+                )
+            await pipe.execute()
+
+        # Keep history in the metrics table via the batched writer
+        for container_id, metrics in results.items():
+            metric_writer.record({"device_id": containers[container_id], **metrics})
+
+    async def _list_device_containers(self):
+        """Map running device container IDs to device IDs"""
+        # Plain dicts from the list endpoint; containers.list() would wrap
+        # every entry in a DockerContainer object on each poll
+        containers = await DockerRuntime.client()._query_json(
+            "containers/json",
+            params={"filters": LIST_FILTERS},
+        )
+        ids = {}
+        for container in containers:
+            suffix = container["Names"][0].lstrip("/").removeprefix("android-")
+            if suffix.isdigit():
+                ids[container["Id"]] = int(suffix)
+        return ids
+
+
+async def get_cached_metrics(container_id: str) -> Optional[Dict]:
+    """Read the last published metrics for a container, if any"""
+    try:
+        if (cached := await redis.get(metrics_key(container_id))) is not None:
+            return orjson.loads(cached)
+    except Exception as e:
+        logger.warning(f"Metrics cache read failed for {container_id}: {e}")
+    return None
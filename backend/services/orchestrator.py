@@ -1,82 +1,188 @@
 import asyncio
 import logging
-from datetime import datetime, timedelta
-from typing import List
-from sqlalchemy import select
+from datetime import datetime, timedelta, timezone
 
-from services.database import async_session, Device, Session
-from services.vm_manager import VMManager
+import psutil
+from sqlalchemy import bindparam, func, update
+
+from config import settings
+from services.cache import invalidate_many
+from services.database import async_session, engine, Device, Session
+from services.db_pool import LoadMonitor, assert_max_queries
+from services.device_registry import device_registry
+from services.vm_manager import vm_manager
 
 logger = logging.getLogger(__name__)
 
+IDLE_TIMEOUT = timedelta(minutes=30)
+IDLE_CHECK_INTERVAL = 300  # seconds, upper bound between idle checks
+IDLE_RETRY_DELAY = 30  # seconds, before retrying devices that failed to stop
+
+# Statements built once; each run only binds new parameter values.
+# Nothing in the session needs syncing, so skip ORM session synchronization.
+_CLAIM_IDLE_DEVICES = (
+    update(Device)
+    .where(
+        Device.id.in_(bindparam("device_ids", expanding=True)),
+        Device.status == "running",
+        Device.last_used < bindparam("threshold"),
+    )
+    .values(status="stopping")
+    .returning(Device)
+    .execution_options(synchronize_session=False)
+)
+
+_SET_DEVICES_STATUS = (
+    update(Device)
+    .where(Device.id.in_(bindparam("device_ids", expanding=True)))
+    .values(status=bindparam("new_status"))
+    .execution_options(synchronize_session=False)
+)
+
+_END_STALE_SESSIONS = (
+    update(Session)
+    .where(
+        Session.status == "disconnected",
+        Session.started_at < bindparam("threshold"),
+    )
+    .values(status="ended", ended_at=func.now())
+    .returning(Session.id)
+    .execution_options(synchronize_session=False)
+)
+
 
 class Orchestrator:
     """Orchestrates VM lifecycle and resource management"""
 
     def __init__(self):
-        self.vm_manager = VMManager()
+        self.vm_manager = vm_manager
+        self.load_monitor = LoadMonitor(
+            engine, capacity=settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+        )
         self.running = False
         self.tasks = []
+        # Ceiling on concurrent VM operations fanned out by the orchestrator
+        self.slots = asyncio.Semaphore(settings.ORCHESTRATOR_MAX_CONCURRENCY)
         logger.info("Orchestrator initialized")
 
     async def start(self):
         """Start orchestrator background tasks"""
         self.running = True
 
+        async with async_session() as db:
+            await device_registry.load(db)
+
         # Start background tasks
-        self.tasks.append(asyncio.create_task(self._cleanup_idle_devices()))
-        self.tasks.append(asyncio.create_task(self._monitor_resources()))
-        self.tasks.append(asyncio.create_task(self._cleanup_stale_sessions()))
+        for coro in (
+            self._cleanup_idle_devices(),
+            self._monitor_resources(),
+            self._cleanup_stale_sessions(),
+        ):
+            task = asyncio.create_task(coro)
+            task.add_done_callback(self._task_done)
+            self.tasks.append(task)
+        await self.load_monitor.start()
 
         logger.info("Orchestrator started")
 
     async def stop(self):
         """Stop orchestrator background tasks"""
         self.running = False
+        await self.load_monitor.stop()
 
         # Cancel all tasks
         for task in self.tasks:
             task.cancel()
 
         await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks.clear()
 
         logger.info("Orchestrator stopped")
 
+    def _task_done(self, task: asyncio.Task):
+        """Surface background loops that died instead of letting them vanish"""
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(
+                f"Orchestrator task {task.get_coro().__name__} crashed: "
+                f"{task.exception()!r}"
+            )
+
+    async def _spawn(self, coro):
+        """Run a VM operation once a concurrency slot is free"""
+        async with self.slots:
+            return await coro
+
     async def _cleanup_idle_devices(self):
         """Stop devices that have been idle for too long"""
         while self.running:
             try:
-                async with async_session() as db:
-                    # Find devices idle for more than 30 minutes
-                    idle_threshold = datetime.utcnow() - timedelta(minutes=30)
-
-                    stmt = select(Device).where(
-                        Device.status == "running", Device.last_used < idle_threshold
-                    )
-                    result = await db.execute(stmt)
-                    idle_devices = result.scalars().all()
-
-                    for device in idle_devices:
-                        logger.info(f"Stopping idle device: {device.id}")
-                        await self.vm_manager.stop_device(device)
-                        device.status = "stopped"
-                        await db.commit()
+                # Find devices idle for more than 30 minutes
+                idle_threshold = datetime.now(timezone.utc) - IDLE_TIMEOUT
+                candidates = device_registry.idle_since(idle_threshold)
+
+                if candidates:
+                    await self._stop_idle_devices(candidates, idle_threshold)
 
             except Exception as e:
                 logger.error(f"Error in cleanup_idle_devices: {e}")
 
-            # Run every 5 minutes
-            await asyncio.sleep(300)
+            # Sleep until the next device can go idle or a device changes state
+            timeout = IDLE_CHECK_INTERVAL
+            if (oldest := device_registry.oldest_last_used()) is not None:
+                next_idle = oldest + IDLE_TIMEOUT - datetime.now(timezone.utc)
+                timeout = min(timeout, max(next_idle.total_seconds(), IDLE_RETRY_DELAY))
+            await device_registry.wait_for_change(timeout)
+
+    @assert_max_queries(4)  # claim, registry resync, mark stopped, release
+    async def _stop_idle_devices(self, candidates, idle_threshold):
+        async with async_session() as db, db.begin():
+            # Commit the claim before stopping anything: once devices are
+            # "stopping", concurrent orchestrators skip them without this
+            # transaction holding row locks and a connection during docker stop
+            candidate_ids = [device.id for device in candidates]
+            result = await db.execute(
+                _CLAIM_IDLE_DEVICES,
+                {"device_ids": candidate_ids, "threshold": idle_threshold},
+            )
+            idle_devices = result.scalars().all()
+
+            # The registry was out of date for devices we could not claim
+            claimed_ids = {device.id for device in idle_devices}
+            if stale_ids := [i for i in candidate_ids if i not in claimed_ids]:
+                await device_registry.load(db, stale_ids)
+
+        if not idle_devices:
+            return
+
+        for device in idle_devices:
+            logger.info(f"Stopping idle device: {device.id}")
+        stopped_ids, failed = await self._stop_devices(idle_devices)
+
+        async with async_session() as db, db.begin():
+            await self._set_status(db, stopped_ids, "stopped")
+            # Release devices that could not be stopped
+            await self._set_status(db, [device.id for device in failed], "running")
+
+        # After commit, so a concurrent read cannot re-cache the old status
+        await invalidate_many("device", list(claimed_ids))
+
+    @staticmethod
+    def _sample_system():
+        """Read CPU (averaged since the previous call) and RAM usage"""
+        return psutil.cpu_percent(interval=None), psutil.virtual_memory().percent
 
     async def _monitor_resources(self):
         """Monitor system resources and take action if needed"""
+        # Prime the CPU counter; the first non-blocking reading is meaningless
+        await asyncio.to_thread(self._sample_system)
+        await asyncio.sleep(1)
+
         while self.running:
             try:
-                # Check system CPU and memory
-                import psutil
-
-                cpu_percent = psutil.cpu_percent(interval=1)
-                memory_percent = psutil.virtual_memory().percent
+                # Check system CPU and memory without blocking the event loop
+                cpu_percent, memory_percent = await asyncio.to_thread(
+                    self._sample_system
+                )
 
                 logger.info(
                     f"System resources - CPU: {cpu_percent}%, RAM: {memory_percent}%"
@@ -92,59 +198,87 @@ class Orchestrator:
             # Run every minute
             await asyncio.sleep(60)
 
+    @assert_max_queries(1)
     async def _emergency_resource_cleanup(self):
         """Emergency cleanup when resources are critically high"""
         try:
             logger.warning("Emergency resource cleanup triggered")
 
-            async with async_session() as db:
-                # Stop least recently used devices
-                stmt = (
-                    select(Device)
-                    .where(Device.status == "running")
-                    .order_by(Device.last_used.asc())
-                    .limit(5)
-                )
+            # Stop least recently used devices
+            devices_to_stop = device_registry.least_recently_used(5)
+
+            for device in devices_to_stop:
+                logger.warning(f"Emergency stopping device: {device.id}")
+            stopped_ids, _ = await self._stop_devices(devices_to_stop)
 
-                result = await db.execute(stmt)
-                devices_to_stop = result.scalars().all()
+            async with async_session() as db, db.begin():
+                await self._set_status(db, stopped_ids, "stopped")
 
-                for device in devices_to_stop:
-                    logger.warning(f"Emergency stopping device: {device.id}")
-                    await self.vm_manager.stop_device(device)
-                    device.status = "stopped"
-                    await db.commit()
+            await invalidate_many("device", [device.id for device in devices_to_stop])
 
         except Exception as e:
             logger.error(f"Error in emergency_resource_cleanup: {e}")
 
+    async def _stop_devices(self, devices):
+        """Stop device containers concurrently, outside any transaction
+
+        Returns the IDs of the stopped devices and the devices that failed.
+        """
+        if not devices:
+            return [], []
+
+        results = await asyncio.gather(
+            *(self._spawn(self.vm_manager.stop_device(device)) for device in devices),
+            return_exceptions=True,
+        )
+
+        stopped_ids = []
+        failed = []
+        for device, result in zip(devices, results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to stop device {device.id}: {result}")
+                failed.append(device)
+            else:
+                stopped_ids.append(device.id)
+
+        return stopped_ids, failed
+
+    @staticmethod
+    async def _set_status(db, device_ids, new_status: str):
+        """Set the status of all ``device_ids`` in one UPDATE"""
+        if device_ids:
+            await db.execute(
+                _SET_DEVICES_STATUS,
+                {"device_ids": device_ids, "new_status": new_status},
+            )
+
     async def _cleanup_stale_sessions(self):
         """Clean up sessions that have been disconnected for too long"""
         while self.running:
             try:
-                async with async_session() as db:
-                    # Find sessions disconnected for more than 1 hour
-                    stale_threshold = datetime.utcnow() - timedelta(hours=1)
-
-                    stmt = select(Session).where(
-                        Session.status == "disconnected",
-                        Session.started_at < stale_threshold,
-                    )
-                    result = await db.execute(stmt)
-                    stale_sessions = result.scalars().all()
-
-                    for session in stale_sessions:
-                        logger.info(f"Ending stale session: {session.id}")
-                        session.status = "ended"
-                        session.ended_at = datetime.utcnow()
-                        await db.commit()
-
+                await self._end_stale_sessions()
             except Exception as e:
                 logger.error(f"Error in cleanup_stale_sessions: {e}")
 
             # Run every 10 minutes
             await asyncio.sleep(600)
 
+    @assert_max_queries(1)
+    async def _end_stale_sessions(self):
+        async with async_session() as db, db.begin():
+            # Find sessions disconnected for more than 1 hour
+            stale_threshold = datetime.now(timezone.utc) - timedelta(hours=1)
+
+            result = await db.execute(
+                _END_STALE_SESSIONS, {"threshold": stale_threshold}
+            )
+            stale_session_ids = result.scalars().all()
+
+            for session_id in stale_session_ids:
+                logger.info(f"Ended stale session: {session_id}")
+
+        await invalidate_many("session", stale_session_ids)
+
     async def scale_up(self, count: int = 1):
         """Pre-provision devices for faster allocation"""
         # This could be used to pre-create warm pools of devices
@@ -1,19 +1,57 @@
 """
 RAW Docker Client - Bypasses all Python docker library issues
 """
+import http.client
 import socket
-import json
 import logging
-import subprocess
-import os
+import queue
+import selectors
+from contextlib import contextmanager
+
+import ijson
+import orjson
 
 logger = logging.getLogger(__name__)
 
+POOL_SIZE = 16
+BUFFER_SIZE = 65536
+BATCH_TIMEOUT = 10  # seconds without any response before a batch gives up
+
+
+class _BufferedSocket:
+    """Socket shim so http.client reads through a 64 KB buffer (default is 8 KB)"""
+    
+    def __init__(self, sock):
+        self.sock = sock
+    
+    def makefile(self, mode):
+        return self.sock.makefile(mode, buffering=BUFFER_SIZE)
+
+
+class _NullSkippingReader:
+    """File-like view of a streaming response without NUL separator bytes"""
+    
+    def __init__(self, response):
+        self.response = response
+    
+    def read(self, size=-1):
+        if size == 0:
+            return b""
+        # read1 returns what has arrived instead of waiting for `size` bytes;
+        # JSON never contains a raw NUL, so dropping them all is safe
+        while data := self.response.read1(size if size > 0 else BUFFER_SIZE):
+            if data := data.replace(b"\x00", b""):
+                return data
+        return b""
+
+
 class RawDockerClient:
     """Raw Docker client that uses direct socket communication"""
     
     def __init__(self):
         self.socket_path = "/var/run/docker.sock"
+        # Idle keep-alive connections, most recently used first
+        self._pool = queue.LifoQueue(maxsize=POOL_SIZE)
         self._test_connection()
     
     def _test_connection(self):
@@ -27,53 +65,147 @@ class RawDockerClient:
             logger.error(f"❌ Raw Docker socket connection failed: {e}")
             raise
     
+    def _get_conn(self):
+        """Take a pooled keep-alive socket or open a new one"""
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return self._connect()
+    
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, BUFFER_SIZE)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, BUFFER_SIZE)
+        sock.connect(self.socket_path)
+        return sock
+    
+    def _put_conn(self, sock):
+        """Return a socket to the pool, closing it if the pool is full"""
+        try:
+            self._pool.put_nowait(sock)
+        except queue.Full:
+            sock.close()
+    
+    def _exchange(self, sock, method, request):
+        """Send one request and read the response with http.client"""
+        sock.sendall(request)
+        
+        # http.client handles Content-Length, chunked and no-body framing
+        response = http.client.HTTPResponse(_BufferedSocket(sock), method=method)
+        response.begin()
+        body = response.read()
+        return response, body
+    
+    @staticmethod
+    def _is_alive(sock):
+        """Check, without blocking, that the daemon has not closed an idle socket"""
+        try:
+            return sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) != b""
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+    
+    @staticmethod
+    def _build_request(method, path, data=None):
+        if data:
+            body = orjson.dumps(data)
+            headers = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nConnection: keep-alive\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+            return headers.encode() + body
+        
+        headers = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nConnection: keep-alive\r\n\r\n"
+        return headers.encode()
+    
+    @staticmethod
+    def _parse_response(response, body):
+        if 200 <= response.status < 300:
+            if "json" in response.getheader("Content-Type", "") and body.strip():
+                return orjson.loads(body)
+            return {"status": "success"}
+        
+        logger.error(f"Docker API error: {response.status} {body[:200]}")
+        return None
+    
+    @contextmanager
+    def _pinned_conn(self):
+        """Run several dependent requests over one live keep-alive connection
+        
+        Yields ``call(method, path, data=None)`` which returns parsed results
+        like ``_send_request`` but raises on connection errors.
+        """
+        sock = self._get_conn()
+        if not self._is_alive(sock):
+            sock.close()
+            sock = self._connect()
+        
+        reusable = True
+        
+        def call(method, path, data=None):
+            nonlocal reusable
+            response, body = self._exchange(
+                sock, method, self._build_request(method, path, data)
+            )
+            reusable = reusable and not response.will_close
+            return self._parse_response(response, body)
+        
+        try:
+            yield call
+        except BaseException:
+            sock.close()
+            raise
+        
+        if reusable:
+            self._put_conn(sock)
+        else:
+            sock.close()
+    
     def _send_request(self, method, path, data=None):
-        """Send raw HTTP request to Docker socket"""
+        """Send HTTP request to Docker socket over a pooled connection"""
         try:
-            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-            sock.connect(self.socket_path)
+            request = self._build_request(method, path, data)
             
-            # Build HTTP request
-            if data:
-                body = json.dumps(data).encode()
-                headers = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
-                request = headers.encode() + body
-            else:
-                headers = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n\r\n"
-                request = headers.encode()
-            
-            sock.send(request)
+            # A pooled socket may have been closed by the daemon while idle;
+            # retry once on a fresh connection in that case
+            for attempt in range(2):
+                pooled = not self._pool.empty()
+                sock = self._get_conn()
+                try:
+                    response, resp_body = self._exchange(sock, method, request)
+                except (OSError, http.client.HTTPException):
+                    sock.close()
+                    if pooled and attempt == 0:
+                        continue
+                    raise
+                break
             
-            # Read response
-            response = b""
-            while True:
-                chunk = sock.recv(4096)
-                if not chunk:
-                    break
-                response += chunk
-                if b"\r\n\r\n" in response and (b"Content-Length:" not in response or len(response) > 10000):
-                    break
-            
-            sock.close()
-            
-            # Parse response
-            response_str = response.decode()
-            if "HTTP/1.1 200" in response_str or "HTTP/1.1 201" in response_str:
-                # Extract JSON body
-                body_start = response_str.find("\r\n\r\n")
-                if body_start != -1:
-                    body = response_str[body_start + 4:]
-                    if body.strip():
-                        return json.loads(body)
-                return {"status": "success"}
+            if response.will_close:
+                sock.close()
             else:
-                logger.error(f"Docker API error: {response_str[:200]}")
-                return None
+                self._put_conn(sock)
+            
+            return self._parse_response(response, resp_body)
                 
         except Exception as e:
             logger.error(f"Raw request failed: {e}")
             return None
     
+    def _send_request_stream(self, method, path):
+        """Yield JSON documents from a streaming endpoint as they arrive"""
+        sock = self._connect()
+        try:
+            sock.sendall(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+            response = http.client.HTTPResponse(_BufferedSocket(sock), method=method)
+            response.begin()
+            if not 200 <= response.status < 300:
+                raise RuntimeError(f"Docker API error: {response.status} {response.read()[:200]}")
+            
+            yield from ijson.items(
+                _NullSkippingReader(response), "", multiple_values=True, use_float=True
+            )
+        finally:
+            # Streams are not pooled; closing also ends the stream server-side
+            sock.close()
+    
     def ping(self):
         """Ping Docker daemon"""
         result = self._send_request("GET", "/_ping")
@@ -84,7 +216,12 @@ class RawDockerClient:
         return self._send_request("GET", "/version")
     
     def create_container(self, image, **kwargs):
-        """Create a container using raw API"""
+        """Create and start a container, returning its post-start inspect data
+        
+        Create, start and inspect share one keep-alive connection; the network
+        is attached at create time so the inspect already carries the IP.
+        """
+        network = kwargs.get("network", "bridge")
         config = {
             "Image": image,
             "Cmd": kwargs.get("command", ["sleep", "infinity"]),
@@ -92,8 +229,9 @@ class RawDockerClient:
             "ExposedPorts": {},
             "HostConfig": {
                 "PortBindings": {},
-                "NetworkMode": kwargs.get("network", "bridge")
-            }
+                "NetworkMode": network
+            },
+            "NetworkingConfig": {"EndpointsConfig": {network: {}}}
         }
         
         # Handle ports
@@ -107,17 +245,24 @@ class RawDockerClient:
         if "environment" in kwargs:
             config["Env"] = [f"{k}={v}" for k, v in kwargs["environment"].items()]
         
-        # Create container
-        result = self._send_request("POST", "/containers/create", config)
-        if result and "Id" in result:
-            container_id = result["Id"]
-            
-            # Start container
-            start_result = self._send_request("POST", f"/containers/{container_id}/start")
-            if start_result is not None:
-                return {"id": container_id, "status": "running"}
+        try:
+            with self._pinned_conn() as call:
+                # Create container
+                result = call("POST", "/containers/create", config)
+                if not result or "Id" not in result:
+                    return None
+                container_id = result["Id"]
+                
+                # Start container
+                if call("POST", f"/containers/{container_id}/start") is None:
+                    return None
+                
+                info = call("GET", f"/containers/{container_id}/json")
+        except Exception as e:
+            logger.error(f"Raw container create failed: {e}")
+            return None
         
-        return None
+        return {"id": container_id, "status": "running", "attrs": info}
     
     def get_container(self, container_id):
         """Get container info"""
@@ -137,6 +282,76 @@ class RawDockerClient:
             path += "?force=true"
         return self._send_request("DELETE", path)
     
+    def stats(self, container_id, stream=True):
+        """Iterate over stats documents for a container (one per second)"""
+        return self._send_request_stream(
+            "GET", f"/containers/{container_id}/stats?stream={str(stream).lower()}"
+        )
+    
+    def get_stats(self, container_id):
+        """Single stats sample without Docker's one-second precpu wait"""
+        return self._send_request(
+            "GET", f"/containers/{container_id}/stats?stream=false&one-shot=true"
+        )
+    
+    def get_stats_batch(self, container_ids):
+        """One-shot stats for many containers with all requests in flight at once
+        
+        Each request goes out on its own pooled socket and an epoll-backed
+        selector hands back responses in whatever order the daemon finishes
+        them, so a batch costs about one request's latency instead of N.
+        Returns ``{container_id: stats}``; failed containers are left out.
+        """
+        results = {}
+        with selectors.DefaultSelector() as selector:
+            for container_id in container_ids:
+                sock = self._get_conn()
+                if not self._is_alive(sock):
+                    sock.close()
+                    sock = self._connect()
+                request = self._build_request(
+                    "GET", f"/containers/{container_id}/stats?stream=false&one-shot=true"
+                )
+                try:
+                    sock.sendall(request)
+                except OSError as e:
+                    logger.error(f"Stats request for {container_id} failed: {e}")
+                    sock.close()
+                    continue
+                selector.register(sock, selectors.EVENT_READ, container_id)
+            
+            while selector.get_map():
+                ready = selector.select(timeout=BATCH_TIMEOUT)
+                if not ready:
+                    logger.error(f"Stats batch timed out with {len(selector.get_map())} pending")
+                    for key in list(selector.get_map().values()):
+                        selector.unregister(key.fileobj)
+                        key.fileobj.close()
+                    break
+                
+                for key, _ in ready:
+                    sock, container_id = key.fileobj, key.data
+                    selector.unregister(sock)
+                    try:
+                        # The daemon writes a small stats body in one go, so once
+                        # the socket is readable the blocking read is immediate
+                        response = http.client.HTTPResponse(_BufferedSocket(sock), method="GET")
+                        response.begin()
+                        stats = self._parse_response(response, response.read())
+                    except (OSError, http.client.HTTPException) as e:
+                        logger.error(f"Stats request for {container_id} failed: {e}")
+                        sock.close()
+                        continue
+                    
+                    if response.will_close:
+                        sock.close()
+                    else:
+                        self._put_conn(sock)
+                    if stats is not None:
+                        results[container_id] = stats
+        
+        return results
+    
     def stop_container(self, container_id):
         """Stop container"""
         return self._send_request("POST", f"/containers/{container_id}/stop")
@@ -145,6 +360,7 @@ class RawDockerClient:
         """Start container"""
         return self._send_request("POST", f"/containers/{container_id}/start")
 
+
 # Wrapper to mimic DockerClient interface
 class RawDockerWrapper:
     """Wrapper to mimic DockerClient interface"""
@@ -1,58 +1,127 @@
+import asyncio
+import functools
 import os
-import docker
-from docker.errors import DockerException, NotFound
+import secrets
+import threading
+from collections import deque
+from types import SimpleNamespace
+import orjson
+from aiodocker.exceptions import DockerContainerError, DockerError
 import logging
-from typing import Dict, Optional
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 import psutil
-from contextlib import suppress
 
 from config import settings
 from services.adb_utils import adb_wait_for_boot, adb_ensure_connected, adb_start_server
+from services.warm_pool import WarmPool
+from services.device_registry import device_registry
+from services.docker_client import get_docker_client
 
 logger = logging.getLogger(__name__)
 
+# Warm containers are booted with the Device model defaults
+WARM_RAM_MB = 2048
+WARM_CPUS = 2
+
+# Docker can report a started container before its network IP is assigned
+IP_INSPECT_ATTEMPTS = 6
+IP_INSPECT_BACKOFF = 0.05  # seconds, doubled after each empty inspect
+
+# Separate in-flight limits per kind of Docker call, so a burst of slow
+# creates (which may pull an image) never queues stops or metric polls
+START_CONCURRENCY = 4
+STOP_CONCURRENCY = 4
+STATS_CONCURRENCY = 16
+
+# Each stats stream holds one connection to the Docker socket for as long as
+# its container runs; beyond this, containers are sampled with one-shot reads
+MAX_STATS_STREAMS = 64
+
+# Host ports can be taken by something the allocator does not know about;
+# Docker reports that when starting the container, so retry with fresh ports
+PORT_CONFLICT_RETRIES = 3
+PORT_CONFLICT_MARKERS = ("port is already allocated", "address already in use")
+
+MB = 1024 * 1024
+
+
+@functools.cache
+def kvm_available() -> bool:
+    """Check if KVM is available on the host (cannot change while running)"""
+    return os.path.exists("/dev/kvm")
+
+
+KVM_DEVICE = {
+    "PathOnHost": "/dev/kvm",
+    "PathInContainer": "/dev/kvm",
+    "CgroupPermissions": "rwm",
+}
+
+
+def is_port_conflict(error: BaseException) -> bool:
+    """Whether Docker refused to start a container because a host port is taken"""
+    return isinstance(error, DockerError) and any(
+        marker in str(error.message) for marker in PORT_CONFLICT_MARKERS
+    )
+
+
+async def remove_container_if_exists(client, container_id: str) -> bool:
+    """Force-remove a container by ID or name; False if it did not exist"""
+    try:
+        await client.containers.container(container_id).delete(force=True)
+        return True
+    except DockerError as e:
+        if e.status != 404:
+            raise
+        return False
+
 
 class DockerRuntime:
-    _client = None
+    # Concurrent starts interleave at every await, so without this two of them
+    # can both see the network missing and create it twice
+    _network_lock = asyncio.Lock()
+    # The device network is created once and never changes, so its ID is
+    # looked up on the first start only
+    _network_id: Optional[str] = None
+
+    @staticmethod
+    def client():
+        """Process-wide aiodocker client sharing one keep-alive connection pool"""
+        return get_docker_client().get_client()
 
     @classmethod
-    def client(cls):
-        if cls._client is None:
-            base_url = os.getenv("DOCKER_HOST", "unix:///var/run/docker.sock")
+    async def ensure_network(cls, client) -> str:
+        """ID of the device network, creating the network if it is missing"""
+        if cls._network_id is not None:
+            return cls._network_id
+
+        async with cls._network_lock:
+            if cls._network_id is not None:
+                return cls._network_id
             try:
-                cls._client = docker.DockerClient(base_url=base_url)
-                # valida conexão (vai falhar se faltar requests-unixsocket ou socket)
-                cls._client.ping()
-            except Exception as e:
-                raise RuntimeError(
-                    f"Docker client not available (base_url={base_url}). "
-                    "Check requests-unixsocket, docker.sock mount and permissions."
-                ) from e
-        return cls._client
+                network = await client.networks.get(settings.ANDROID_NETWORK)
+                logger.info(f"Using existing network: {settings.ANDROID_NETWORK}")
+            except DockerError as e:
+                if e.status != 404:
+                    raise
+                logger.info(f"Creating network: {settings.ANDROID_NETWORK}")
+                network = await client.networks.create(
+                    {
+                        "Name": settings.ANDROID_NETWORK,
+                        "Driver": "bridge",
+                        "CheckDuplicate": True,
+                    }
+                )
+            cls._network_id = network.id
+            return network.id
 
     @classmethod
-    def start_android_vm(cls, device):
+    async def start_android_vm(cls, device):
         client = cls.client()
         name = f"android-{device.id}"
         image = settings.ANDROID_BASE_IMAGE  # ex: "ghcr.io/.../android-webrtc:latest"
 
-        # Remove existing container if any
-        with suppress(NotFound):
-            existing_container = client.containers.get(name)
-            existing_container.remove(force=True)
-            logger.info(f"Removed existing container: {name}")
-
-        # Ensure network exists
-        try:
-            network = client.networks.get(settings.ANDROID_NETWORK)
-            logger.info(f"Using existing network: {settings.ANDROID_NETWORK}")
-        except NotFound:
-            logger.info(f"Creating network: {settings.ANDROID_NETWORK}")
-            network = client.networks.create(
-                name=settings.ANDROID_NETWORK, driver="bridge"
-            )
+        network_id = await cls.ensure_network(client)
 
         # Container configuration
         environment = {
@@ -62,70 +131,93 @@ class DockerRuntime:
             "WEBRTC_PORT": str(getattr(device, "webrtc_port", 8080)),
         }
 
-        ports = {}
-        if hasattr(device, "adb_port") and device.adb_port:
-            ports[f"{device.adb_port}/tcp"] = device.adb_port
-        if hasattr(device, "webrtc_port") and device.webrtc_port:
-            ports[f"{device.webrtc_port}/tcp"] = device.webrtc_port
-
-        return client.containers.run(
-            image=image,
-            name=name,
-            detach=True,
-            privileged=True,  # se precisa de /dev/kvm no Linux
-            environment=environment,
-            ports=ports,
-            volumes=getattr(device, "volumes", {}),
-            restart_policy={"Name": "unless-stopped"},
-            network=settings.ANDROID_NETWORK,
-            mem_limit=f"{device.ram_allocated}m",
-            cpu_count=device.cpu_allocated,
-        )
+        ports = {
+            f"{port}/tcp": port
+            for port in (
+                getattr(device, "adb_port", None),
+                getattr(device, "webrtc_port", None),
+            )
+            if port
+        }
+
+        binds = [
+            f"{host}:{volume['bind']}:{volume.get('mode', 'rw')}"
+            for host, volume in getattr(device, "volumes", {}).items()
+        ]
+
+        # Same settings docker-py's run() produced, in Engine API form
+        config = {
+            "Image": image,
+            "Env": [f"{key}={value}" for key, value in environment.items()],
+            "ExposedPorts": {port: {} for port in ports},
+            "HostConfig": {
+                "Privileged": True,  # se precisa de /dev/kvm no Linux
+                "Devices": [KVM_DEVICE] if kvm_available() else [],
+                "PortBindings": {
+                    port: [{"HostPort": str(host_port)}]
+                    for port, host_port in ports.items()
+                },
+                "Binds": binds,
+                "RestartPolicy": {"Name": "unless-stopped"},
+                "NetworkMode": network_id,
+                "Memory": device.ram_allocated * MB,
+                "CpuCount": device.cpu_allocated,
+            },
+        }
+
+        try:
+            return await client.containers.run(config, name=name)
+        except DockerError as e:
+            if is_port_conflict(e):
+                # Created but never started: drop it so a retry can reuse the name
+                await remove_container_if_exists(client, name)
+                raise
+            if e.status == 404:
+                # The cached network may have been deleted; look it up again
+                cls._network_id = None
+            # 409 from create: a container from an earlier run holds the name
+            if e.status != 409 or isinstance(e, DockerContainerError):
+                raise
+
+        await remove_container_if_exists(client, name)
+        logger.info(f"Removed existing container: {name}")
+        return await client.containers.run(config, name=name)
 
 
 class VMManager:
     """Manages Android virtual device containers"""
 
     def __init__(self):
-        self.executor = ThreadPoolExecutor(max_workers=10)
         self.port_allocator = PortAllocator()
-
-        try:
-            # Test DockerRuntime client
-            logger.info("Initializing Docker client...")
-            client = DockerRuntime.client()
-            logger.info("✅ VMManager initialized with DockerRuntime")
-        except Exception as e:
-            logger.error(f"❌ VMManager initialization failed: {e}")
-            raise
+        # container ID -> (total_usage, system_cpu_usage) from the last poll
+        self.cpu_samples: Dict[str, tuple] = {}
+        # container ID -> task following its stats stream, and its last metrics
+        self.stats_streams: Dict[str, asyncio.Task] = {}
+        self.latest_metrics: Dict[str, Dict] = {}
+        self.start_slots = asyncio.Semaphore(START_CONCURRENCY)
+        self.stop_slots = asyncio.Semaphore(STOP_CONCURRENCY)
+        self.stats_slots = asyncio.Semaphore(STATS_CONCURRENCY)
+        self.warm_pool = WarmPool(
+            self._boot_warm_container,
+            self._discard_warm_container,
+            settings.WARM_POOL_SIZE,
+            name="container",
+        )
 
     async def start_device(self, device) -> Dict:
         """Start an Android emulator container"""
         try:
             logger.info(f"Starting device {device.id}: {device.device_name}")
 
-            # Allocate ports
-            webrtc_port = self.port_allocator.allocate_port()
-            adb_port = self.port_allocator.allocate_port()
+            if self._matches_warm_spec(device) and (warm := self.warm_pool.acquire()):
+                return await self._start_from_warm(device, warm)
 
-            # Set ports on device object
-            device.webrtc_port = webrtc_port
-            device.adb_port = adb_port
-
-            # Use DockerRuntime to start container
-            loop = asyncio.get_event_loop()
-            container = await loop.run_in_executor(
-                self.executor, DockerRuntime.start_android_vm, device
-            )
-
-            # Get container IP
-            container.reload()
-            networks = container.attrs["NetworkSettings"]["Networks"]
-            ip_address = networks.get(settings.ANDROID_NETWORK, {}).get(
-                "IPAddress", ""
-            ) or container.attrs["NetworkSettings"].get("IPAddress", "localhost")
+            # Start the container on freshly allocated ports and read its IP
+            container, ip_address = await self._start_on_free_ports(device)
+            webrtc_port, adb_port = device.webrtc_port, device.adb_port
 
             logger.info(f"Device {device.id} started: {container.id[:12]}")
+            device_registry.mark_running(device.id, container.id, webrtc_port, adb_port)
             logger.info(f"Device IP: {ip_address}")
 
             # Wait for Android to complete boot before returning
@@ -159,49 +251,122 @@ class VMManager:
             logger.error(f"Failed to start device {device.id}: {e}")
             raise
 
-    def _create_container(self, name, environment, webrtc_port, adb_port, device):
-        """Create and start Docker container (runs in thread pool)"""
-        try:
-            # Remove existing container if any
-            client = DockerRuntime.client()
-            with suppress(NotFound):
-                old_container = client.containers.get(name)
-                old_container.remove(force=True)
-                logger.info(f"Removed old container: {name}")
-
-            # Ensure network exists
-            client = DockerRuntime.client()
+    async def _start_on_free_ports(self, device):
+        """Allocate host ports for ``device`` and start it, rotating taken ones"""
+        for attempt in range(PORT_CONFLICT_RETRIES + 1):
+            device.webrtc_port, device.adb_port = self.port_allocator.allocate_ports(2)
             try:
-                network = client.networks.get(settings.ANDROID_NETWORK)
-                logger.info(f"Using existing network: {settings.ANDROID_NETWORK}")
-            except NotFound:
-                logger.info(f"Creating network: {settings.ANDROID_NETWORK}")
-                network = client.networks.create(
-                    name=settings.ANDROID_NETWORK, driver="bridge"
+                return await self._start_and_inspect(device)
+            except BaseException as e:
+                # No container holds the ports; freed ones go to the back of the list
+                self.port_allocator.free_port(device.webrtc_port)
+                self.port_allocator.free_port(device.adb_port)
+                if not is_port_conflict(e) or attempt == PORT_CONFLICT_RETRIES:
+                    raise
+                logger.warning(
+                    f"⚠️ Host port taken outside the allocator, retrying: {e.message}"
                 )
 
-            # Create container
-            return client.containers.run(
-                image=settings.ANDROID_BASE_IMAGE,
-                name=name,
-                environment=environment,
-                ports={
-                    f"{adb_port}/tcp": adb_port,
-                    f"{webrtc_port}/tcp": webrtc_port,
-                },
-                devices=["/dev/kvm"] if self._check_kvm_available() else [],
-                privileged=True,
-                detach=True,
-                network=settings.ANDROID_NETWORK,
-                mem_limit=f"{device.ram_allocated}m",
-                cpu_count=device.cpu_allocated,
-                restart_policy={"Name": "unless-stopped"},
-            )
+    async def _start_and_inspect(self, device):
+        """Run a device container and read its IP once it has started"""
+        async with self.start_slots:
+            container = await DockerRuntime.start_android_vm(device)
+            try:
+                return container, await self._wait_for_ip(container)
+            except Exception:
+                await container.delete(force=True)
+                raise
+
+    @staticmethod
+    async def _wait_for_ip(container) -> str:
+        """Inspect a started container until its device-network IP is assigned"""
+        delay = IP_INSPECT_BACKOFF
+        for _ in range(IP_INSPECT_ATTEMPTS):
+            network_settings = (await container.show(size=False))["NetworkSettings"]
+            if ip_address := network_settings["Networks"].get(
+                settings.ANDROID_NETWORK, {}
+            ).get("IPAddress") or network_settings.get("IPAddress"):
+                return ip_address
+            await asyncio.sleep(delay)
+            delay *= 2
+
+        logger.warning(f"No IP assigned to {container.id[:12]}, using localhost")
+        return "localhost"
+
+    @staticmethod
+    def _matches_warm_spec(device) -> bool:
+        return (
+            device.device_model == settings.EMULATOR_DEVICE
+            and device.ram_allocated == WARM_RAM_MB
+            and device.cpu_allocated == WARM_CPUS
+        )
 
-        except Exception as e:
-            logger.error(f"Error creating container: {e}")
+    async def _boot_warm_container(self) -> Dict:
+        """Create and fully boot an unassigned container for the warm pool"""
+        spec = SimpleNamespace(
+            id=f"warm-{secrets.token_hex(4)}",
+            device_model=settings.EMULATOR_DEVICE,
+            ram_allocated=WARM_RAM_MB,
+            cpu_allocated=WARM_CPUS,
+        )
+        container, ip_address = await self._start_on_free_ports(spec)
+        warm = {
+            "container": container,
+            "ip_address": ip_address,
+            "webrtc_port": spec.webrtc_port,
+            "adb_port": spec.adb_port,
+        }
+
+        try:
+            await adb_wait_for_boot(f"{warm['ip_address']}:5555", timeout=120)
+        except BaseException:
+            await self._discard_warm_container(warm)
             raise
 
+        return warm
+
+    async def _discard_warm_container(self, warm: Dict):
+        """Remove an unassigned warm container and release its ports"""
+        if container := warm.get("container"):
+            await self._remove_container(container.id)
+        self.port_allocator.free_port(warm["webrtc_port"])
+        self.port_allocator.free_port(warm["adb_port"])
+
+    async def _start_from_warm(self, device, warm: Dict) -> Dict:
+        """Hand an already booted warm container to a device"""
+        container = warm["container"]
+        await self._adopt_container(container, f"android-{device.id}")
+
+        device.webrtc_port = warm["webrtc_port"]
+        device.adb_port = warm["adb_port"]
+        device_registry.mark_running(
+            device.id, container.id, device.webrtc_port, device.adb_port
+        )
+        logger.info(
+            f"Device {device.id} started from warm container {container.id[:12]}"
+        )
+
+        return {
+            "container_id": container.id,
+            "ip_address": warm["ip_address"],
+            "webrtc_port": device.webrtc_port,
+            "adb_port": device.adb_port,
+            "status": "running",
+        }
+
+    async def _adopt_container(self, container, name):
+        """Rename a warm container to the device's name"""
+        try:
+            await container.rename(name)
+            return
+        except DockerError as e:
+            if e.status != 409:
+                raise
+
+        await remove_container_if_exists(DockerRuntime.client(), name)
+        logger.info(f"Removed old container: {name}")
+        await container.rename(name)
+
     async def stop_device(self, device):
         """Stop an Android emulator container"""
         try:
@@ -211,16 +376,15 @@ class VMManager:
 
             logger.info(f"Stopping device {device.id}")
 
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                self.executor, self._stop_container, device.container_id
-            )
+            await self._stop_container(device.container_id)
+            self._forget_stats(device.container_id)
 
             # Free allocated ports
             if device.webrtc_port:
                 self.port_allocator.free_port(device.webrtc_port)
             if device.adb_port:
                 self.port_allocator.free_port(device.adb_port)
+            device_registry.mark_stopped(device.id)
 
             logger.info(f"Device {device.id} stopped")
 
@@ -228,13 +392,16 @@ class VMManager:
             logger.error(f"Failed to stop device {device.id}: {e}")
             raise
 
-    def _stop_container(self, container_id):
-        """Stop Docker container (runs in thread pool)"""
+    async def _stop_container(self, container_id):
+        """Stop Docker container"""
         try:
             client = DockerRuntime.client()
-            container = client.containers.get(container_id)
-            container.stop(timeout=10)
-        except NotFound:
+            async with self.stop_slots:
+                await client.containers.container(container_id).stop(t=10)
+        except DockerError as e:
+            if e.status != 404:
+                logger.error(f"Error stopping container: {e}")
+                raise
             logger.warning(f"Container {container_id} not found")
         except Exception as e:
             logger.error(f"Error stopping container: {e}")
@@ -262,16 +429,15 @@ class VMManager:
 
             logger.info(f"Removing device {device.id}")
 
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                self.executor, self._remove_container, device.container_id
-            )
+            await self._remove_container(device.container_id)
+            self._forget_stats(device.container_id)
 
             # Free allocated ports
             if device.webrtc_port:
                 self.port_allocator.free_port(device.webrtc_port)
             if device.adb_port:
                 self.port_allocator.free_port(device.adb_port)
+            device_registry.mark_stopped(device.id)
 
             logger.info(f"Device {device.id} removed")
 
@@ -279,107 +445,180 @@ class VMManager:
             logger.error(f"Failed to remove device {device.id}: {e}")
             raise
 
-    def _remove_container(self, container_id):
-        """Remove Docker container (runs in thread pool)"""
+    async def _remove_container(self, container_id):
+        """Remove Docker container"""
         try:
-            client = DockerRuntime.client()
-            container = client.containers.get(container_id)
-            container.remove(force=True)
-        except NotFound:
-            logger.warning(f"Container {container_id} not found")
+            async with self.stop_slots:
+                removed = await remove_container_if_exists(
+                    DockerRuntime.client(), container_id
+                )
+            if not removed:
+                logger.warning(f"Container {container_id} not found")
         except Exception as e:
             logger.error(f"Error removing container: {e}")
             raise
 
     async def get_container_metrics(self, container_id: str) -> Dict:
-        """Get container resource usage metrics"""
+        """Get container resource usage metrics
+
+        Returns the latest sample from the container's stats stream, starting
+        the stream on first use; until it delivers, a one-shot read is used.
+        """
+        if (metrics := self.latest_metrics.get(container_id)) is not None:
+            return metrics
+
+        self._follow_stats(container_id)
         try:
-            loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(
-                self.executor, self._get_container_stats, container_id
-            )
+            return await self._get_container_stats(container_id)
         except Exception as e:
             logger.error(f"Failed to get metrics for {container_id}: {e}")
             return {"cpu_usage": 0, "ram_usage": 0, "network_in": 0, "network_out": 0}
 
-    def _get_container_stats(self, container_id):
-        """Get container stats (runs in thread pool)"""
-        try:
-            client = DockerRuntime.client()
-            container = client.containers.get(container_id)
-            stats = container.stats(stream=False)
-
-            # Calculate CPU usage
-            cpu_delta = (
-                stats["cpu_stats"]["cpu_usage"]["total_usage"]
-                - stats["precpu_stats"]["cpu_usage"]["total_usage"]
-            )
-            system_delta = (
-                stats["cpu_stats"]["system_cpu_usage"]
-                - stats["precpu_stats"]["system_cpu_usage"]
+    async def get_all_metrics(self, container_ids) -> Dict[str, Dict]:
+        """Metrics for many containers, all stats requests in flight together"""
+        results = await asyncio.gather(
+            *(self.get_container_metrics(cid) for cid in container_ids)
+        )
+        return dict(zip(container_ids, results))
+
+    async def stop_stats_streams(self):
+        """Close every open stats stream"""
+        tasks = list(self.stats_streams.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _follow_stats(self, container_id: str):
+        if (
+            container_id not in self.stats_streams
+            and len(self.stats_streams) < MAX_STATS_STREAMS
+        ):
+            self.stats_streams[container_id] = asyncio.create_task(
+                self._read_stats_stream(container_id)
             )
-            cpu_count = stats["cpu_stats"].get("online_cpus", 1)
-
-            cpu_usage = 0.0
-            if system_delta > 0:
-                cpu_usage = (cpu_delta / system_delta) * cpu_count * 100.0
 
-            # Calculate memory usage
-            ram_usage = stats["memory_stats"].get("usage", 0) / (
-                1024 * 1024
-            )  # Convert to MB
+    def _forget_stats(self, container_id: str):
+        if task := self.stats_streams.pop(container_id, None):
+            task.cancel()
+        self.latest_metrics.pop(container_id, None)
+        self.cpu_samples.pop(container_id, None)
 
-            # Network stats
-            networks = stats.get("networks", {})
-            network_in = sum(net.get("rx_bytes", 0) for net in networks.values()) / (
-                1024 * 1024
-            )
-            network_out = sum(net.get("tx_bytes", 0) for net in networks.values()) / (
-                1024 * 1024
+    async def _read_stats_stream(self, container_id: str):
+        """Keep the latest metrics from Docker's once-per-second stats stream"""
+        try:
+            container = DockerRuntime.client().containers.container(container_id)
+            async for stats in container.stats(stream=True):
+                # Streamed documents carry the previous tick in precpu_stats
+                precpu = stats.get("precpu_stats", {})
+                self.latest_metrics[container_id] = self._usage_metrics(
+                    stats,
+                    (
+                        precpu.get("cpu_usage", {}).get("total_usage", 0),
+                        precpu.get("system_cpu_usage", 0),
+                    ),
+                )
+        except Exception as e:
+            logger.warning(f"Stats stream for {container_id[:12]} ended: {e}")
+        finally:
+            # The stream ends when the container stops; the next read restarts it
+            if self.stats_streams.get(container_id) is asyncio.current_task():
+                del self.stats_streams[container_id]
+                self.latest_metrics.pop(container_id, None)
+
+    async def _get_container_stats(self, container_id):
+        """Get container stats"""
+        try:
+            # one-shot skips Docker's one-second second sample (precpu_stats
+            # comes back empty); the raw body is parsed with orjson
+            async with self.stats_slots, DockerRuntime.client()._query(
+                f"containers/{container_id}/stats",
+                params={"stream": False, "one-shot": True},
+            ) as response:
+                stats = orjson.loads(await response.read())
+
+            # Calculate CPU usage against the previous poll's sample
+            cpu_stats = stats["cpu_stats"]
+            previous = self.cpu_samples.get(container_id)
+            self.cpu_samples[container_id] = (
+                cpu_stats["cpu_usage"]["total_usage"],
+                cpu_stats.get("system_cpu_usage", 0),
             )
-
-            return {
-                "cpu_usage": round(cpu_usage, 2),
-                "ram_usage": round(ram_usage, 2),
-                "network_in": round(network_in, 2),
-                "network_out": round(network_out, 2),
-            }
+            return self._usage_metrics(stats, previous)
 
         except Exception as e:
             logger.error(f"Error getting container stats: {e}")
             return {"cpu_usage": 0, "ram_usage": 0, "network_in": 0, "network_out": 0}
 
-    def _check_kvm_available(self) -> bool:
-        """Check if KVM is available on the host"""
-        try:
-            import os
+    @staticmethod
+    def _usage_metrics(stats: Dict, previous: Optional[tuple]) -> Dict:
+        """Metrics from one stats document, CPU diffed against ``previous``
+
+        ``previous`` is an earlier (total_usage, system_cpu_usage) sample; CPU
+        is reported as 0 when there is none to compare against.
+        """
+        cpu_stats = stats["cpu_stats"]
+        total_usage = cpu_stats["cpu_usage"]["total_usage"]
+        system_usage = cpu_stats.get("system_cpu_usage", 0)
+
+        cpu_usage = 0.0
+        if previous:
+            previous_total, previous_system = previous
+            if previous_system and system_usage > previous_system:
+                cpu_usage = (
+                    (total_usage - previous_total)
+                    / (system_usage - previous_system)
+                    * cpu_stats.get("online_cpus", 1)
+                    * 100.0
+                )
+
+        ram_usage = stats["memory_stats"].get("usage", 0) / MB
+
+        # One pass over the interfaces for both directions
+        rx_bytes = tx_bytes = 0
+        for net in stats.get("networks", {}).values():
+            rx_bytes += net.get("rx_bytes", 0)
+            tx_bytes += net.get("tx_bytes", 0)
+
+        network_in = rx_bytes / MB
+        network_out = tx_bytes / MB
 
-            return os.path.exists("/dev/kvm")
-        except Exception:
-            return False
+        return {
+            "cpu_usage": round(cpu_usage, 2),
+            "ram_usage": round(ram_usage, 2),
+            "network_in": round(network_in, 2),
+            "network_out": round(network_out, 2),
+        }
 
 
 class PortAllocator:
     """Manages port allocation for containers"""
 
     def __init__(self):
+        # Free list: allocate from the front, freed ports go to the back
+        self.free_ports = deque(
+            range(settings.WEBRTC_PORT_RANGE_START, settings.WEBRTC_PORT_RANGE_END + 1)
+        )
         self.allocated_ports = set()
-        self.current_port = settings.WEBRTC_PORT_RANGE_START
-
-    def allocate_port(self) -> int:
-        """Allocate an available port"""
-        while self.current_port <= settings.WEBRTC_PORT_RANGE_END:
-            if self.current_port not in self.allocated_ports:
-                port = self.current_port
-                self.allocated_ports.add(port)
-                self.current_port += 1
-                return port
-            self.current_port += 1
-
-        # sourcery skip: raise-specific-error
-        raise Exception("No available ports in range")
+        # Keeps allocation safe if called from executor threads too
+        self.lock = threading.Lock()
+
+    def allocate_ports(self, count: int) -> List[int]:
+        """Allocate ``count`` available ports, all or none"""
+        with self.lock:
+            if len(self.free_ports) < count:
+                # sourcery skip: raise-specific-error
+                raise Exception("No available ports in range")
+            ports = [self.free_ports.popleft() for _ in range(count)]
+            self.allocated_ports.update(ports)
+            return ports
 
     def free_port(self, port: int):
         """Free an allocated port"""
-        if port in self.allocated_ports:
-            self.allocated_ports.remove(port)
+        with self.lock:
+            if port in self.allocated_ports:
+                self.allocated_ports.remove(port)
+                self.free_ports.append(port)
+
+
+# Global VM manager instance (owns port allocation, so there must be one)
+vm_manager = VMManager()
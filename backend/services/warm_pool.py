@@ -0,0 +1,106 @@
+"""Pool of pre-built resources (emulator containers, peer connections)"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+RETRY_DELAY = 30  # seconds to wait after a failed build
+
+
+class WarmPool:
+    """Keeps ``size`` resources built and ready in the background
+
+    ``boot`` is a coroutine function that builds one resource and returns a
+    handle for it; ``discard`` destroys an unused handle. Resources are built
+    one at a time so replenishing never spikes the host. With ``max_age`` set,
+    handles older than that are discarded and rebuilt in the background, so
+    ``acquire`` never hands out a stale one.
+    """
+
+    def __init__(
+        self,
+        boot,
+        discard,
+        size: int,
+        name: str = "resource",
+        max_age: Optional[float] = None,
+    ):
+        self.boot = boot
+        self.discard = discard
+        self.size = size
+        self.name = name
+        self.max_age = max_age
+        self.warm = deque()  # (built_at, handle), oldest first
+        self.wakeup = asyncio.Event()
+        self.running = False
+        self.task = None
+
+    async def start(self):
+        """Start filling the pool"""
+        if self.size <= 0:
+            return
+
+        self.running = True
+        self.task = asyncio.create_task(self._replenish())
+        logger.info(f"Warm {self.name} pool started (size {self.size})")
+
+    async def stop(self):
+        """Stop replenishing and destroy handles nobody acquired"""
+        self.running = False
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+
+        warm, self.warm = list(self.warm), deque()
+        await asyncio.gather(
+            *(self.discard(handle) for _, handle in warm), return_exceptions=True
+        )
+        logger.info(f"Warm {self.name} pool stopped")
+
+    def acquire(self):
+        """Take the newest warm handle if a fresh one is ready, else None"""
+        if not self.warm:
+            return None
+
+        self.wakeup.set()
+        if self._expired(self.warm[-1][0]):
+            return None
+        return self.warm.pop()[1]
+
+    def _expired(self, built_at: float) -> bool:
+        return self.max_age is not None and time.monotonic() - built_at >= self.max_age
+
+    async def _replenish(self):
+        while self.running:
+            await self._discard_expired()
+
+            if len(self.warm) < self.size:
+                try:
+                    self.warm.append((time.monotonic(), await self.boot()))
+                    logger.info(f"🔥 Warm {self.name}s ready: {len(self.warm)}")
+                except Exception as e:
+                    logger.error(f"Failed to build warm {self.name}: {e}")
+                    await asyncio.sleep(RETRY_DELAY)
+                continue
+
+            # Sleep until a handle is taken or the oldest one expires
+            timeout = None
+            if self.max_age is not None:
+                timeout = self.warm[0][0] + self.max_age - time.monotonic()
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _discard_expired(self):
+        while self.warm and self._expired(self.warm[0][0]):
+            _, handle = self.warm.popleft()
+            try:
+                await self.discard(handle)
+            except Exception as e:
+                logger.error(f"Failed to discard stale {self.name}: {e}")
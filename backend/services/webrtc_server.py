@@ -1,23 +1,46 @@
 import asyncio
+import functools
+import io
 import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Optional
-import json
-import subprocess
+import shlex
 import fractions
 
+import orjson
+
 from config import settings
+from services.adb_utils import InputBatcher
+from services.warm_pool import WarmPool
 from services.h264_streamer import H264Player, ScreenrecordPlayer
 
 logger = logging.getLogger(__name__)
 
+# Answer c= lines are pointed at the public IP when one is configured. SDP is
+# ASCII, so the rewrite runs on bytes
+C_LINE_RE = re.compile(rb"c=IN IP4 \d+\.\d+\.\d+\.\d+")
+PUBLIC_C_LINE = settings.WEBRTC_PUBLIC_IP and (
+    f"c=IN IP4 {settings.WEBRTC_PUBLIC_IP}".encode("ascii")
+)
+
+# Pooled connections older than this are rebuilt in the background; aiortc
+# has no ICE restart, and the NAT bindings behind their server-reflexive
+# candidates may have lapsed
+WARM_PC_MAX_AGE = 120  # seconds
+
 # WebRTC imports - optional, will be needed for full functionality
 try:
+    from aioice import Candidate
     from aiortc import (
+        RTCIceCandidate,
         RTCPeerConnection,
         RTCSessionDescription,
         VideoStreamTrack,
         RTCConfiguration,
         RTCIceServer,
+        RTCRtpSender,
     )
     from aiortc.contrib.media import MediaRelay
     from av import VideoFrame
@@ -28,11 +51,14 @@ except ImportError:
     logger.warning("aiortc not installed. WebRTC streaming will not be available.")
     logger.info("To enable WebRTC: pip install aiortc av numpy")
     WEBRTC_AVAILABLE = False
+    Candidate = None
+    RTCIceCandidate = None
     RTCPeerConnection = None
     RTCSessionDescription = None
     VideoStreamTrack = None
     RTCConfiguration = None
     RTCIceServer = None
+    RTCRtpSender = None
     MediaRelay = None
     VideoFrame = None
 
@@ -42,6 +68,18 @@ class WebRTCManager:
 
     def __init__(self):
         self.peer_connections = {}
+        # Remote ICE candidates per connection, applied in order by one task
+        self.ice_queues: Dict[str, asyncio.Queue] = {}
+        self.ice_tasks: Dict[str, asyncio.Task] = {}
+        self.input_batchers: Dict[str, InputBatcher] = {}
+        # Connections whose video transport has already gathered candidates
+        self.pc_pool = WarmPool(
+            self._prepare_pc,
+            self._discard_pc,
+            settings.WEBRTC_WARM_CONNECTIONS if WEBRTC_AVAILABLE else 0,
+            name="peer connection",
+            max_age=WARM_PC_MAX_AGE,
+        )
 
         if not WEBRTC_AVAILABLE:
             logger.warning("WebRTC Manager initialized WITHOUT WebRTC support")
@@ -96,6 +134,9 @@ class WebRTCManager:
             elif msg_type == "ice-candidate":
                 return await self._handle_ice_candidate(message, container_id)
 
+            elif msg_type == "ice-candidates":
+                return await self._handle_ice_candidates(message, container_id)
+
             elif msg_type == "input":
                 return await self._handle_input(message, device_ip)
 
@@ -112,9 +153,11 @@ class WebRTCManager:
     ) -> Dict:
         """Handle WebRTC offer and create answer"""
         try:
-            # Create peer connection
-            pc = RTCPeerConnection(configuration=self.rtc_config)
+            # Create peer connection, pre-gathered if one is ready
+            pc = self._new_peer_connection()
             self.peer_connections[container_id] = pc
+            self._stop_ice_drain(container_id)
+            ice_queue = self.ice_queues[container_id] = asyncio.Queue()
 
             # Add event handlers for debugging
             @pc.on("connectionstatechange")
@@ -149,34 +192,30 @@ class WebRTCManager:
                 async def on_message(message):
                     """Handle control messages from client"""
                     try:
-                        data = json.loads(message)
+                        data = orjson.loads(message)
                         await self._handle_datachannel_message(data, device_ip)
                     except Exception as e:
                         logger.error(f"Error handling datachannel message: {e}")
 
-            # Create H.264 video stream from Android device
-            # Try scrcpy first (lower latency), fallback to screenrecord
-            device_serial = f"{device_ip}:5555"
-            logger.info(f"Starting H.264 stream for {device_serial}...")
+            # Set remote description first so ICE transports exist
+            offer = RTCSessionDescription(sdp=message["sdp"], type=message["type"])
+            await pc.setRemoteDescription(offer)
 
-            try:
-                h264_player = H264Player(device_serial)
-                await h264_player.start()
-                logger.info("✅ Using scrcpy H.264 stream (low latency)")
-            except Exception as scrcpy_error:
-                logger.warning(f"Scrcpy failed: {scrcpy_error}, trying screenrecord...")
-                try:
-                    h264_player = ScreenrecordPlayer(device_serial)
-                    await h264_player.start()
-                    logger.info("✅ Using screenrecord H.264 stream")
-                except Exception as screenrecord_error:
-                    logger.error(f"Screenrecord also failed: {screenrecord_error}")
-                    raise RuntimeError("Both scrcpy and screenrecord failed")
+            # Candidates only match a transceiver once the offer is applied
+            self.ice_tasks[container_id] = asyncio.create_task(
+                self._drain_ice(pc, ice_queue)
+            )
+
+            # Gather ICE candidates (STUN/TURN round trips) while the video
+            # pipeline starts, rather than afterwards in setLocalDescription
+            h264_player, _ = await asyncio.gather(
+                self._start_h264_player(f"{device_ip}:5555"), self._gather_ice(pc)
+            )
 
             # Store player reference for cleanup
             pc._h264_player = h264_player
 
-            # Add H.264 video track to peer connection
+            # Add H.264 video track to the transceiver the offer created
             video_track = h264_player.video()
             if video_track:
                 pc.addTrack(video_track)
@@ -184,9 +223,15 @@ class WebRTCManager:
             else:
                 raise RuntimeError("Failed to get video track from H.264 player")
 
-            # Now set remote description
-            offer = RTCSessionDescription(sdp=message["sdp"], type=message["type"])
-            await pc.setRemoteDescription(offer)
+            # The track carries pre-encoded H.264, so only H.264 may be negotiated
+            h264_codecs = [
+                codec
+                for codec in RTCRtpSender.getCapabilities("video").codecs
+                if codec.mimeType == "video/H264"
+            ]
+            for transceiver in pc.getTransceivers():
+                if transceiver.kind == "video":
+                    transceiver.setCodecPreferences(h264_codecs)
 
             # Create answer
             answer = await pc.createAnswer()
@@ -194,16 +239,11 @@ class WebRTCManager:
 
             # Modify SDP to use public IP if configured
             answer_sdp = pc.localDescription.sdp
-            if settings.WEBRTC_PUBLIC_IP:
-                # Replace private IPs with public IP in SDP
-                import re
-
+            if PUBLIC_C_LINE:
                 # Replace c= lines with public IP
-                answer_sdp = re.sub(
-                    r"c=IN IP4 (\d+\.\d+\.\d+\.\d+)",
-                    f"c=IN IP4 {settings.WEBRTC_PUBLIC_IP}",
-                    answer_sdp,
-                )
+                answer_sdp = C_LINE_RE.sub(
+                    PUBLIC_C_LINE, answer_sdp.encode("ascii")
+                ).decode("ascii")
                 logger.info(
                     f"Modified SDP to use public IP: {settings.WEBRTC_PUBLIC_IP}"
                 )
@@ -217,86 +257,76 @@ class WebRTCManager:
             logger.error(f"Error handling offer: {e}")
             raise
 
+    async def _prepare_pc(self):
+        """Create a connection with a video transceiver and gather its candidates
+
+        An offer's video m-line takes over this transceiver, and with BUNDLE
+        its transport carries all media, so the offer skips gathering.
+        """
+        pc = RTCPeerConnection(configuration=self.rtc_config)
+        try:
+            transceiver = pc.addTransceiver("video", direction="sendonly")
+            await transceiver.receiver.transport.transport.iceGatherer.gather()
+        except BaseException:
+            await pc.close()
+            raise
+
+        return pc
+
+    @staticmethod
+    async def _discard_pc(pc):
+        await pc.close()
+
+    def _new_peer_connection(self):
+        """A fresh pooled connection if one is ready, else a new one"""
+        return self.pc_pool.acquire() or RTCPeerConnection(
+            configuration=self.rtc_config
+        )
+
+    @staticmethod
+    async def _start_h264_player(device_serial: str):
+        """Start the device's H.264 stream: scrcpy first, screenrecord fallback"""
+        logger.info(f"Starting H.264 stream for {device_serial}...")
+
+        try:
+            h264_player = H264Player(device_serial)
+            await h264_player.start()
+            logger.info("✅ Using scrcpy H.264 stream (low latency)")
+        except Exception as scrcpy_error:
+            logger.warning(f"Scrcpy failed: {scrcpy_error}, trying screenrecord...")
+            try:
+                h264_player = ScreenrecordPlayer(device_serial)
+                await h264_player.start()
+                logger.info("✅ Using screenrecord H.264 stream")
+            except Exception as screenrecord_error:
+                logger.error(f"Screenrecord also failed: {screenrecord_error}")
+                raise RuntimeError("Both scrcpy and screenrecord failed")
+
+        return h264_player
+
+    @staticmethod
+    async def _gather_ice(pc):
+        """Gather local candidates of every ICE transport the offer set up
+
+        aiortc has no trickle ICE: setLocalDescription gathers before it
+        returns. Gathering ahead makes that step immediate.
+        """
+        transports = {t.receiver.transport for t in pc.getTransceivers()}
+        if pc.sctp:
+            transports.add(pc.sctp.transport)
+        await asyncio.gather(*(t.transport.iceGatherer.gather() for t in transports))
+
     async def _handle_ice_candidate(self, message: Dict, container_id: str) -> None:
-        # sourcery skip: low-code-quality
         """Handle ICE candidate from client"""
         try:
-            if pc := self.peer_connections.get(container_id):
-                from aiortc import RTCIceCandidate
-
+            if ice_queue := self.ice_queues.get(container_id):
                 candidate_data = message.get("candidate", {})
 
-                # Extract ICE candidate string
-                candidate_str = candidate_data.get("candidate", "")
-                sdp_mid = candidate_data.get("sdpMid")
-                sdp_mline_index = candidate_data.get("sdpMLineIndex", 0)
-
-                if candidate_str:
+                if candidate_data.get("candidate"):
                     logger.info(
                         f"🧊 Received remote ICE candidate for {container_id[:12]}"
                     )
-                    logger.debug(f"   Candidate: {candidate_str[:80]}...")
-                    logger.debug(
-                        f"   sdpMid: {sdp_mid}, sdpMLineIndex: {sdp_mline_index}"
-                    )
-
-                    try:
-                        from aiortc import RTCIceCandidate
-
-                        # Parse ICE candidate manually from the string
-                        # Format: "candidate:foundation component protocol priority ip port typ type ..."
-                        parts = candidate_str.split()
-
-                        if len(parts) < 8:
-                            raise ValueError(
-                                f"Invalid candidate format: {candidate_str}"
-                            )
-
-                        # Extract fields from candidate string
-                        foundation = (
-                            parts[0].split(":")[1] if ":" in parts[0] else parts[0]
-                        )
-                        component = int(parts[1])
-                        protocol = parts[2]
-                        priority = int(parts[3])
-                        ip = parts[4]
-                        port = int(parts[5])
-                        typ_idx = parts.index("typ")
-                        cand_type = parts[typ_idx + 1]
-
-                        # Create RTCIceCandidate
-                        ice_candidate = RTCIceCandidate(
-                            component=component,
-                            foundation=foundation,
-                            ip=ip,
-                            port=port,
-                            priority=priority,
-                            protocol=protocol,
-                            type=cand_type,
-                            sdpMid=sdp_mid,
-                            sdpMLineIndex=sdp_mline_index,
-                        )
-
-                        # Add related address if present (for srflx/relay)
-                        if "raddr" in parts and "rport" in parts:
-                            raddr_idx = parts.index("raddr")
-                            rport_idx = parts.index("rport")
-                            ice_candidate.relatedAddress = parts[raddr_idx + 1]
-                            ice_candidate.relatedPort = (
-                                int(parts[rport_idx + 1])
-                                if parts[rport_idx + 1] != "0"
-                                else None
-                            )
-
-                        # Add to peer connection
-                        await pc.addIceCandidate(ice_candidate)
-                        logger.info(
-                            f"✅ Remote ICE candidate added: {cand_type} {ip}:{port}"
-                        )
-                    except Exception as parse_error:
-                        logger.error(f"❌ Failed to parse ICE candidate: {parse_error}")
-                        logger.error(f"   Full candidate: {candidate_str}")
-                        logger.error(f"   Raw data: {candidate_data}")
+                    self._queue_ice_candidate(ice_queue, candidate_data)
                 else:
                     logger.info(
                         f"🧊 ICE gathering complete signal received for {container_id[:12]}"
@@ -305,6 +335,74 @@ class WebRTCManager:
         except Exception as e:
             logger.error(f"❌ Error handling ICE candidate: {e}", exc_info=True)
 
+    async def _handle_ice_candidates(self, message: Dict, container_id: str) -> None:
+        """Handle a batch of trickled ICE candidates sent in one message"""
+        try:
+            if ice_queue := self.ice_queues.get(container_id):
+                candidates = [c for c in message.get("candidates", []) if c]
+                logger.info(
+                    f"🧊 Received {len(candidates)} remote ICE candidates "
+                    f"for {container_id[:12]}"
+                )
+                for candidate_data in candidates:
+                    if candidate_data.get("candidate"):
+                        self._queue_ice_candidate(ice_queue, candidate_data)
+
+        except Exception as e:
+            logger.error(f"❌ Error handling ICE candidates: {e}", exc_info=True)
+
+    @staticmethod
+    def _queue_ice_candidate(ice_queue: asyncio.Queue, candidate_data: Dict):
+        """Parse one client candidate and queue it for _drain_ice"""
+        candidate_str = candidate_data["candidate"]
+        sdp_mid = candidate_data.get("sdpMid")
+        sdp_mline_index = candidate_data.get("sdpMLineIndex", 0)
+        logger.debug(f"   Candidate: {candidate_str[:80]}...")
+        logger.debug(f"   sdpMid: {sdp_mid}, sdpMLineIndex: {sdp_mline_index}")
+
+        try:
+            # aioice parses the line without its "candidate:" name
+            parsed = Candidate.from_sdp(candidate_str.removeprefix("candidate:"))
+            ice_candidate = RTCIceCandidate(
+                component=parsed.component,
+                foundation=parsed.foundation,
+                ip=parsed.host,
+                port=parsed.port,
+                priority=parsed.priority,
+                protocol=parsed.transport,
+                type=parsed.type,
+                relatedAddress=parsed.related_address,
+                relatedPort=parsed.related_port,
+                sdpMid=sdp_mid,
+                sdpMLineIndex=sdp_mline_index,
+                tcpType=parsed.tcptype,
+            )
+
+            # Applied by _drain_ice without blocking signaling
+            ice_queue.put_nowait(ice_candidate)
+        except Exception as parse_error:
+            logger.error(f"❌ Failed to parse ICE candidate: {parse_error}")
+            logger.error(f"   Full candidate: {candidate_str}")
+            logger.error(f"   Raw data: {candidate_data}")
+
+    async def _drain_ice(self, pc, ice_queue: asyncio.Queue):
+        """Add queued remote candidates to a connection, one at a time"""
+        while True:
+            candidate = await ice_queue.get()
+            try:
+                await pc.addIceCandidate(candidate)
+                logger.info(
+                    f"✅ Remote ICE candidate added: "
+                    f"{candidate.type} {candidate.ip}:{candidate.port}"
+                )
+            except Exception as e:
+                logger.error(f"❌ Failed to add ICE candidate: {e}")
+
+    def _stop_ice_drain(self, container_id: str):
+        self.ice_queues.pop(container_id, None)
+        if task := self.ice_tasks.pop(container_id, None):
+            task.cancel()
+
     async def _handle_datachannel_message(self, data: Dict, device_ip: str):
         """Handle messages from WebRTC DataChannel (touch, swipe, etc.)"""
         try:
@@ -312,7 +410,7 @@ class WebRTCManager:
             device_serial = f"{device_ip}:5555"
 
             # Display dimensions (should match H.264 stream size)
-            DISPLAY_W, DISPLAY_H = 1280, 720
+            DISPLAY_W, DISPLAY_H = settings.VIDEO_WIDTH, settings.VIDEO_HEIGHT
 
             if msg_type == "tap":
                 # Normalized coordinates (0..1) from client
@@ -325,11 +423,7 @@ class WebRTCManager:
 
                 logger.info(f"👆 Tap at ({px}, {py})")
 
-                cmd = f"adb -s {device_serial} shell input tap {px} {py}"
-                proc = await asyncio.create_subprocess_shell(
-                    cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-                )
-                await proc.communicate()
+                self._adb_input(device_serial, "tap", px, py)
 
             elif msg_type == "swipe":
                 # Swipe gesture
@@ -341,21 +435,13 @@ class WebRTCManager:
 
                 logger.info(f"👉 Swipe from ({x1},{y1}) to ({x2},{y2})")
 
-                cmd = f"adb -s {device_serial} shell input swipe {x1} {y1} {x2} {y2} {duration}"
-                proc = await asyncio.create_subprocess_shell(
-                    cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-                )
-                await proc.communicate()
+                self._adb_input(device_serial, "swipe", x1, y1, x2, y2, int(duration))
 
             elif msg_type == "keyevent":
                 keycode = data.get("keycode")
                 logger.info(f"⌨️ Keyevent: {keycode}")
 
-                cmd = f"adb -s {device_serial} shell input keyevent {keycode}"
-                proc = await asyncio.create_subprocess_shell(
-                    cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-                )
-                await proc.communicate()
+                self._adb_input(device_serial, "keyevent", keycode)
 
         except Exception as e:
             logger.error(f"Error handling datachannel message: {e}")
@@ -385,15 +471,23 @@ class WebRTCManager:
             logger.error(f"Error handling input: {e}")
             return {"type": "input-ack", "success": False, "error": str(e)}
 
+    def _adb_input(self, device_serial: str, *args):
+        """Queue `input ...` for the device's persistent adb shell
+
+        Reusing one shell skips an adb fork/exec and device-side shell per
+        event; arguments are quoted since the shell parses each line.
+        """
+        if (batcher := self.input_batchers.get(device_serial)) is None:
+            batcher = self.input_batchers[device_serial] = InputBatcher(device_serial)
+        batcher.submit(shlex.join(["input", *map(str, args)]))
+
     async def _send_touch_event(self, device_ip: str, x: int, y: int, action: str):
         """Send touch event to Android device via ADB"""
         try:
-            if action == "tap":
-                cmd = f"adb -s {device_ip}:5555 shell input tap {x} {y}"
-            process = await asyncio.create_subprocess_shell(
-                cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-            )
-            await process.communicate()
+            if action != "tap":
+                logger.warning(f"Unsupported touch action: {action}")
+                return
+            self._adb_input(f"{device_ip}:5555", "tap", int(x), int(y))
 
         except Exception as e:
             logger.error(f"Error sending touch event: {e}")
@@ -401,12 +495,7 @@ class WebRTCManager:
     async def _send_key_event(self, device_ip: str, keycode: int):
         """Send key event to Android device via ADB"""
         try:
-            cmd = f"adb -s {device_ip}:5555 shell input keyevent {keycode}"
-
-            process = await asyncio.create_subprocess_shell(
-                cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-            )
-            await process.communicate()
+            self._adb_input(f"{device_ip}:5555", "keyevent", keycode)
 
         except Exception as e:
             logger.error(f"Error sending key event: {e}")
@@ -414,14 +503,8 @@ class WebRTCManager:
     async def _send_text(self, device_ip: str, text: str):
         """Send text input to Android device via ADB"""
         try:
-            # Escape text for shell
-            escaped_text = text.replace(" ", "%s")
-            cmd = f"adb -s {device_ip}:5555 shell input text '{escaped_text}'"
-
-            process = await asyncio.create_subprocess_shell(
-                cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-            )
-            await process.communicate()
+            # `input text` reads %s as a space
+            self._adb_input(f"{device_ip}:5555", "text", text.replace(" ", "%s"))
 
         except Exception as e:
             logger.error(f"Error sending text: {e}")
@@ -429,6 +512,7 @@ class WebRTCManager:
     async def close_connection(self, container_id: str):
         """Close WebRTC connection"""
         try:
+            self._stop_ice_drain(container_id)
             if pc := self.peer_connections.get(container_id):
                 await pc.close()
                 del self.peer_connections[container_id]
@@ -438,6 +522,37 @@ class WebRTCManager:
             logger.error(f"Error closing connection: {e}")
 
 
+# One pool bounds screenshot decoding CPU across all tracks
+decode_executor = ThreadPoolExecutor(
+    max_workers=os.cpu_count() or 1, thread_name_prefix="frame-decode"
+)
+
+
+@functools.lru_cache(maxsize=1)
+def test_pattern():
+    """Solid fallback image, built once and shared by every track"""
+    # The RGB triple broadcasts across every pixel in one store
+    return np.full((720, 1280, 3), (100, 50, 50), dtype=np.uint8)
+
+
+def decode_screenshot(png: bytes):
+    """Decode a PNG screencap into an RGB array of at most 720 rows"""
+    from PIL import Image
+
+    img_pil = Image.open(io.BytesIO(png))
+
+    # Resize to standard resolution if needed (for performance)
+    if img_pil.height > 720:
+        img_pil = img_pil.resize((1280, 720), Image.LANCZOS)
+
+    img = np.array(img_pil)
+
+    # Convert RGBA to RGB if needed
+    if img.shape[2] == 4:
+        img = img[:, :, :3]
+    return img
+
+
 if WEBRTC_AVAILABLE:
 
     class AndroidVideoTrack(VideoStreamTrack):
@@ -451,8 +566,25 @@ if WEBRTC_AVAILABLE:
             self.counter = 0
             self.adb_connected = False
             self.last_good_frame = None
+            # argv built once; capture runs without an intermediate shell
+            self.connect_argv = ("adb", "connect", f"{device_ip}:5555")
+            self.screencap_argv = (
+                "adb",
+                "-s",
+                f"{device_ip}:5555",
+                "exec-out",
+                "screencap",
+                "-p",
+            )
+            # Converted once; only the timestamp changes between sends
+            self.test_pattern = VideoFrame.from_ndarray(test_pattern(), format="rgb24")
+            self.test_pattern.time_base = fractions.Fraction(1, 30)
             logger.info(f"AndroidVideoTrack initialized for {device_ip}:{port}")
 
+        def _test_pattern_frame(self):
+            self.test_pattern.pts = self.counter
+            return self.test_pattern
+
         async def _ensure_adb_connected(self):
             """Ensure ADB is connected to the device"""
             if self.adb_connected:
@@ -460,9 +592,8 @@ if WEBRTC_AVAILABLE:
 
             try:
                 # Try to connect to ADB device
-                connect_cmd = ["adb", "connect", f"{self.device_ip}:5555"]
                 connect_proc = await asyncio.create_subprocess_exec(
-                    *connect_cmd,
+                    *self.connect_argv,
                     stdout=asyncio.subprocess.PIPE,
                     stderr=asyncio.subprocess.PIPE,
                 )
@@ -499,93 +630,57 @@ if WEBRTC_AVAILABLE:
                 self.counter += 1
                 if self.last_good_frame:
                     return self.last_good_frame
-
-                img = np.zeros((720, 1280, 3), dtype=np.uint8)
-                img[:, :, 0] = 100
-                img[:, :, 1] = 50
-                img[:, :, 2] = 50
-
-                frame = VideoFrame.from_ndarray(img, format="rgb24")
-                frame.pts = self.counter
-                frame.time_base = fractions.Fraction(1, 30)
-                return frame
+                return self._test_pattern_frame()
 
             try:
-                import asyncio
-                from concurrent.futures import ThreadPoolExecutor
-
-                # Use ThreadPoolExecutor to avoid blocking the event loop
-                loop = asyncio.get_event_loop()
-                with ThreadPoolExecutor() as pool:
-                    # Take a screenshot using ADB screencap (PNG format)
-                    # This is simpler and more reliable than H264 streaming
-                    cmd = [
-                        "adb",
-                        "-s",
-                        f"{self.device_ip}:5555",
-                        "exec-out",
-                        "screencap",
-                        "-p",
-                    ]
-
-                    process = await asyncio.create_subprocess_exec(
-                        *cmd,
-                        stdout=asyncio.subprocess.PIPE,
-                        stderr=asyncio.subprocess.PIPE,
-                    )
-
-                    stdout, stderr = await process.communicate()
-
-                    if stderr and self.counter < 5:  # Only log first few errors
-                        logger.warning(f"ADB stderr: {stderr.decode()[:100]}")
-
-                    if not stdout or len(stdout) < 100:
-                        if self.counter < 5:
-                            logger.error("❌ Failed to capture screenshot, retrying...")
-                        # Retry connection on next frame
-                        self.adb_connected = False
-                        # sourcery skip: raise-specific-error
-                        raise Exception("Screenshot capture failed")
+                # Take a screenshot using ADB screencap (PNG format)
+                # This is simpler and more reliable than H264 streaming
+                process = await asyncio.create_subprocess_exec(
+                    *self.screencap_argv,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                )
 
-                    # Decode PNG to numpy array
-                    import io
-                    from PIL import Image
+                stdout, stderr = await process.communicate()
 
-                    img_pil = Image.open(io.BytesIO(stdout))
-                    img = np.array(img_pil)
+                if stderr and self.counter < 5:  # Only log first few errors
+                    logger.warning(f"ADB stderr: {stderr.decode()[:100]}")
 
-                    # Convert RGBA to RGB if needed
-                    if img.shape[2] == 4:
-                        img = img[:, :, :3]
+                if not stdout or len(stdout) < 100:
+                    if self.counter < 5:
+                        logger.error("❌ Failed to capture screenshot, retrying...")
+                    # Retry connection on next frame
+                    self.adb_connected = False
+                    # sourcery skip: raise-specific-error
+                    raise Exception("Screenshot capture failed")
 
-                    # Resize to standard resolution if needed (for performance)
-                    if img.shape[0] > 720:
-                        img_pil = img_pil.resize((1280, 720), Image.LANCZOS)
-                        img = np.array(img_pil)
-                        if img.shape[2] == 4:
-                            img = img[:, :, :3]
+                # Decode PNG on the shared pool to keep the event loop free
+                loop = asyncio.get_running_loop()
+                img = await loop.run_in_executor(
+                    decode_executor, decode_screenshot, stdout
+                )
 
-                    self.counter += 1
+                self.counter += 1
 
-                    # Create VideoFrame
-                    frame = VideoFrame.from_ndarray(img, format="rgb24")
-                    frame.pts = self.counter
-                    frame.time_base = fractions.Fraction(1, 30)
+                # Create VideoFrame
+                frame = VideoFrame.from_ndarray(img, format="rgb24")
+                frame.pts = self.counter
+                frame.time_base = fractions.Fraction(1, 30)
 
-                    # Store last good frame
-                    self.last_good_frame = frame
+                # Store last good frame
+                self.last_good_frame = frame
 
-                    if (
-                        self.counter == 1 or self.counter % 30 == 0
-                    ):  # Log first and every second
-                        logger.info(
-                            f"📸 Captured frame {self.counter} ({img.shape[1]}x{img.shape[0]})"
-                        )
+                if (
+                    self.counter == 1 or self.counter % 30 == 0
+                ):  # Log first and every second
+                    logger.info(
+                        f"📸 Captured frame {self.counter} ({img.shape[1]}x{img.shape[0]})"
+                    )
 
-                    # Control framerate (30 fps)
-                    await asyncio.sleep(1 / 30)
+                # Control framerate (30 fps)
+                await asyncio.sleep(1 / 30)
 
-                    return frame
+                return frame
 
             except Exception as e:
                 if self.counter < 5:
@@ -597,17 +692,7 @@ if WEBRTC_AVAILABLE:
 
                 if self.last_good_frame:
                     return self.last_good_frame
-
-                img = np.zeros((720, 1280, 3), dtype=np.uint8)
-                img[:, :, 0] = 100
-                img[:, :, 1] = 50
-                img[:, :, 2] = 50
-
-                frame = VideoFrame.from_ndarray(img, format="rgb24")
-                frame.pts = self.counter
-                frame.time_base = fractions.Fraction(1, 30)
-
-                return frame
+                return self._test_pattern_frame()
 
         def __del__(self):
             """Cleanup"""
@@ -0,0 +1,40 @@
+import asyncio
+from contextlib import contextmanager
+
+import pytest
+
+from services.database import engine
+from services.db_pool import CONNECTION_ERRORS, count_queries
+
+
+@pytest.fixture
+def db():
+    """Skip the test unless the configured database is reachable"""
+
+    async def ping():
+        try:
+            async with engine.connect():
+                pass
+        finally:
+            # Pooled connections are bound to this event loop
+            await engine.dispose()
+
+    try:
+        asyncio.run(ping())
+    except CONNECTION_ERRORS as e:
+        pytest.skip(f"Database not reachable: {e}")
+    yield
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture
+def assert_max_queries():
+    """``with assert_max_queries(n):`` fails if the block runs more than n statements"""
+
+    @contextmanager
+    def check(limit: int):
+        with count_queries() as counter:
+            yield counter
+        assert counter[0] <= limit, f"ran {counter[0]} queries (limit {limit})"
+
+    return check
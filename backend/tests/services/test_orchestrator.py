@@ -0,0 +1,26 @@
+import asyncio
+from types import SimpleNamespace
+
+from services.database import async_session
+from services.orchestrator import orchestrator
+
+
+def test_stop_devices_marks_all_stopped_in_one_query(
+    db, assert_max_queries, monkeypatch
+):
+    async def stop_device(device):
+        pass
+
+    monkeypatch.setattr(orchestrator.vm_manager, "stop_device", stop_device)
+    devices = [SimpleNamespace(id=device_id) for device_id in range(-20, 0)]
+
+    async def run():
+        with assert_max_queries(0):
+            stopped_ids, failed = await orchestrator._stop_devices(devices)
+        async with async_session() as session:
+            with assert_max_queries(1):
+                await orchestrator._set_status(session, stopped_ids, "stopped")
+            await session.rollback()
+        return stopped_ids, failed
+
+    assert asyncio.run(run()) == ([device.id for device in devices], [])
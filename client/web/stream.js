@@ -148,6 +148,10 @@ async function setupWebRTC() {
             ]
         });
 
+        // Video first: its m-line leads the BUNDLE group, so the server keeps
+        // the pre-gathered video transport for everything
+        peerConnection.addTransceiver('video', { direction: 'recvonly' });
+
         // Create DataChannel for control (must be created before offer)
         controlChannel = peerConnection.createDataChannel('control');
 